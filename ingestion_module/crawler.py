@@ -0,0 +1,381 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CAPES_BASE_URL = "https://www.periodicos.capes.gov.br"
+CAPES_SEARCH_PATH = "/index.php/acervo/buscador.html?q=intelig%C3%AAncia+artificial&source=&publishyear_min%5B%5D=1943&publishyear_max%5B%5D=2025&page="
+
+
+# Funções de parsing das páginas do CAPES
+def parse_search_page(html, base_url=CAPES_BASE_URL):
+    """Extrai as URLs dos artigos de uma página de resultados de busca"""
+    soup = BeautifulSoup(html, "html.parser")
+    links = soup.find_all('a', class_='titulo-busca')
+    return [urljoin(base_url, link.get('href')) for link in links if link.get('href')]
+
+
+# Meta tags com a data de publicação, na ordem de preferência
+PUBLICATION_DATE_META = (
+    "citation_publication_date", "citation_date", "citation_year", "dc.date.issued",
+    "dcterms.issued", "dc.date", "prism.publicationdate"
+)
+_YEAR_RE = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+
+
+def parse_publication_year(soup):
+    """Ano de publicação das meta tags de citação/Dublin Core da página (None se ausente)"""
+    metas = {
+        (tag.get("name") or tag.get("property") or "").lower(): tag.get("content") or ""
+        for tag in soup.find_all("meta")
+    }
+    for name in PUBLICATION_DATE_META:
+        match = _YEAR_RE.search(metas.get(name, ""))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def parse_article_page(html, url):
+    """Extrai título, descrição, link do documento completo e ano de publicação de uma página de artigo"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    meta_tag = soup.find("meta", attrs={"name": "title"})
+    if not meta_tag or not meta_tag.get("content"):
+        raise ValueError("Não foi possível encontrar a meta tag com o título do artigo.")
+    title = meta_tag.get("content")
+
+    meta_tag = soup.find("meta", attrs={"name": "description"})
+    if not meta_tag or not meta_tag.get("content"):
+        raise ValueError("Não foi possível encontrar a meta tag com a descrição do artigo.")
+    description = meta_tag.get("content")
+
+    button = soup.find("a", id="item-acessar")
+    if button and button.has_attr("href"):
+        href = urljoin(url, button["href"])
+    else:
+        href = url  # Fallback para a URL original
+
+    return title, description, href, parse_publication_year(soup)
+
+
+def parse_fulltext_page(html):
+    """Extrai o texto de uma página de documento completo (equivalente ao WebBaseLoader)"""
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.find("title")
+    return soup.get_text(), title.get_text() if title else ""
+
+
+class HostLimiter:
+    """Limita a concorrência e a taxa de requisições por host"""
+
+    def __init__(self, max_concurrency=4, requests_per_second=2.0):
+        self.max_concurrency = max_concurrency
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_concurrency)
+            return self._semaphores[host]
+
+    def _wait_turn(self, host):
+        """Reserva o próximo horário livre do host e espera até ele"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    @contextmanager
+    def slot(self, host):
+        semaphore = self._semaphore(host)
+        with semaphore:
+            self._wait_turn(host)
+            yield
+
+
+class UrlFrontier:
+    """
+    Fronteira de URLs persistida em disco
+
+    Cada URL fica pendente até ser marcada como concluída ou com falha, então um
+    crawl interrompido retoma exatamente das URLs que ainda não terminaram.
+    """
+
+    def __init__(self, path, save_interval=5.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._last_save = 0.0
+        self.pending = {}
+        self.done = {}
+        self.failed = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.pending = state.get("pending", {})
+        self.done = state.get("done", {})
+        self.failed = state.get("failed", {})
+        print(f"Fronteira retomada: {len(self.pending)} pendentes, {len(self.done)} concluídas")
+
+    def add(self, urls, kind):
+        """Adiciona URLs ainda não vistas, retornando quantas foram adicionadas"""
+        added = 0
+        with self._lock:
+            for url in urls:
+                if url in self.done or url in self.pending or url in self.failed:
+                    continue
+                self.pending[url] = kind
+                added += 1
+        self._maybe_save()
+        return added
+
+    def pending_urls(self, kind):
+        with self._lock:
+            return [url for url, url_kind in self.pending.items() if url_kind == kind]
+
+    def mark_done(self, url):
+        with self._lock:
+            self.done[url] = self.pending.pop(url, "article")
+        self._maybe_save()
+
+    def mark_failed(self, url, error):
+        with self._lock:
+            kind = self.pending.pop(url, "article")
+            self.failed[url] = {"kind": kind, "error": str(error)}
+        self._maybe_save()
+
+    def retry_failed(self, kind=None):
+        """Devolve as URLs com falha (de um tipo ou de todos) para a fila de pendentes"""
+        with self._lock:
+            for url, failure in list(self.failed.items()):
+                if kind is None or failure["kind"] == kind:
+                    self.pending[url] = failure["kind"]
+                    del self.failed[url]
+
+    def requeue_done(self):
+        """Devolve as URLs concluídas para a fila de pendentes"""
+        with self._lock:
+            for url, kind in self.done.items():
+                self.pending.setdefault(url, kind)
+            self.done.clear()
+        self.save()
+
+    def _maybe_save(self):
+        # A conferência e a reserva do horário acontecem juntas: só uma thread grava por intervalo
+        with self._lock:
+            if time.monotonic() - self._last_save < self.save_interval:
+                return
+            self._last_save = time.monotonic()
+        self.save()
+
+    def save(self):
+        """
+        Grava o estado de forma atômica (arquivo temporário único + rename)
+
+        As gravações são serializadas e cada uma copia o estado já dentro da
+        vez dela, então um estado mais antigo nunca substitui um mais novo.
+        """
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                state = {
+                    "pending": dict(self.pending),
+                    "done": dict(self.done),
+                    "failed": dict(self.failed)
+                }
+                self._last_save = time.monotonic()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.")
+            try:
+                with open(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+
+class CapesCrawler:
+    """
+    Crawler concorrente do Portal de Periódicos CAPES
+
+    Usa uma única sessão HTTP com pool de conexões keep-alive, limita a
+    concorrência e a taxa por host, repete requisições com backoff exponencial
+    e persiste a fronteira de URLs para permitir retomar o crawl.
+
+    Com um manifesto de ingestão, as páginas já ingeridas são pedidas com GET
+    condicional (If-None-Match/If-Modified-Since) e as partes que responderem
+    304 voltam como None no artigo.
+    """
+
+    def __init__(self, base_url=CAPES_BASE_URL, search_path=CAPES_SEARCH_PATH,
+                 frontier_path="./crawl_frontier.json", max_workers=8,
+                 per_host_concurrency=4, requests_per_second=2.0,
+                 max_retries=3, backoff_factor=0.5, timeout=30, manifest=None):
+        self.base_url = base_url.rstrip("/")
+        self.manifest = manifest
+        self.search_path = search_path
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.frontier = UrlFrontier(frontier_path)
+        self.limiter = HostLimiter(per_host_concurrency, requests_per_second)
+        self.session = self._build_session(max_workers, max_retries, backoff_factor)
+
+    def _build_session(self, pool_size, max_retries, backoff_factor):
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "HEAD"],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def fetch(self, url, **kwargs):
+        """Baixa uma URL respeitando os limites do host"""
+        host = urlparse(url).netloc
+        with self.limiter.slot(host):
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+        if response.status_code not in (200, 304):
+            raise ValueError(f"Erro ao acessar a URL: {url} (status {response.status_code})")
+        return response
+
+    def search_page_url(self, page):
+        return f"{self.base_url}{self.search_path}{page}"
+
+    def _conditional_fetch(self, article_url, url):
+        """GET condicional; retorna (response, validadores da resposta)"""
+        headers = self.manifest.validator_headers(article_url, url) if self.manifest else {}
+        response = self.fetch(url, headers=headers)
+        validators = {}
+        if response.status_code == 200:
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            }
+        return response, validators
+
+    def fetch_article(self, url):
+        """
+        Baixa a página do artigo e o documento completo
+
+        Quando uma página não mudou desde a última ingestão (304), a parte
+        correspondente ("description" ou "full_text") vem como None.
+        """
+        entry = self.manifest.get(url) if self.manifest else None
+        validators = {}
+
+        response, validators[url] = self._conditional_fetch(url, url)
+        if response.status_code == 304 and entry:
+            title, description, fulldoc_url = entry["title"], None, entry["fulldoc_url"]
+            publication_year = entry.get("publication_year")
+        else:
+            title, description, fulldoc_url, publication_year = parse_article_page(response.text, url)
+
+        full_text = ""
+        try:
+            response, validators[fulldoc_url] = self._conditional_fetch(url, fulldoc_url)
+            if response.status_code == 304 and entry:
+                full_text = None
+            else:
+                full_text, _ = parse_fulltext_page(response.text)
+        except Exception as e:
+            print(f"Erro ao baixar documento completo {fulldoc_url}: {e}")
+
+        return {
+            "url": url,
+            "title": title,
+            "description": description,
+            "fulldoc_url": fulldoc_url,
+            "full_text": full_text,
+            "publication_year": publication_year,
+            "validators": validators
+        }
+
+    def requeue_done(self):
+        """Devolve todas as URLs concluídas à fila (atualização periódica do corpus)"""
+        self.frontier.requeue_done()
+
+    def discover(self, pages):
+        """Visita as páginas de busca e adiciona os artigos encontrados à fronteira"""
+        self.frontier.add([self.search_page_url(i) for i in range(pages)], kind="search")
+        search_urls = self.frontier.pending_urls("search")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in search_urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    article_urls = parse_search_page(future.result().text, self.base_url)
+                    added = self.frontier.add(article_urls, kind="article")
+                    self.frontier.mark_done(url)
+                    print(f"Página {url}: {added} novos artigos")
+                except Exception as e:
+                    print(f"Erro ao processar página {url}: {e}")
+                    self.frontier.mark_failed(url, e)
+
+        self.frontier.save()
+
+    def crawl(self, pages, handle_article, retry_failed=False):
+        """
+        Executa o crawl completo
+
+        Args:
+            pages: Número de páginas de busca a visitar
+            handle_article: Função chamada com o dicionário de cada artigo baixado
+            retry_failed: Se True, tenta novamente os artigos que falharam antes
+
+        Returns:
+            Número de artigos processados nesta execução
+        """
+        if retry_failed:
+            self.frontier.retry_failed(kind="article")
+        self.discover(pages)
+
+        article_urls = self.frontier.pending_urls("article")
+        print(f"{len(article_urls)} artigos pendentes na fronteira")
+        processed = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_article, url): url for url in article_urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    handle_article(future.result())
+                    self.frontier.mark_done(url)
+                    processed += 1
+                except Exception as e:
+                    print(f"Erro ao processar {url}: {e}")
+                    self.frontier.mark_failed(url, e)
+
+        self.frontier.save()
+        return processed
@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from crawler import CapesCrawler
+from manifest import IngestManifest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "capes")
+
+# Página do buscador sem resultados (o portal responde assim após a última página)
+EMPTY_SEARCH_PAGE = b"<!DOCTYPE html><html><body><div id=\"resultados\"></div></body></html>"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Responde como o Portal de Periódicos CAPES a partir das páginas em FIXTURES_DIR
+
+    - /index.php/acervo/buscador.html?...&page=N -> search_page_N.html
+    - /index.php/acervo/detalhes/<id>.html       -> <id>.html
+    - /fulltext/<id>.html                        -> <id>_full.html
+
+    Envia ETag e Last-Modified e responde 304 a GETs condicionais. Com
+    `flaky`, a primeira requisição de cada caminho recebe 503, para exercitar
+    as novas tentativas do crawler.
+    """
+
+    fixtures_dir = FIXTURES_DIR
+    flaky = False
+    requests_seen = None
+    lock = threading.Lock()
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        with self.lock:
+            first = self.requests_seen.get(self.path, 0) == 0
+            self.requests_seen[self.path] = self.requests_seen.get(self.path, 0) + 1
+        if self.flaky and first:
+            self._send(503, b"", {"Retry-After": "0"})
+            return
+
+        body, mtime = self._load(parsed)
+        if body is None:
+            self._send(404, b"Not Found")
+            return
+
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True)}
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", headers)
+            return
+        self._send(200, body, dict(headers, **{"Content-Type": "text/html; charset=utf-8"}))
+
+    def _load(self, parsed):
+        """Conteúdo e data de modificação da fixture de um caminho (None se não existir)"""
+        path = parsed.path
+        if path == "/index.php/acervo/buscador.html":
+            page = parse_qs(parsed.query).get("page", ["0"])[0]
+            filename = f"search_page_{page}.html"
+            if not os.path.exists(os.path.join(self.fixtures_dir, filename)):
+                return EMPTY_SEARCH_PAGE, 0
+        elif path.startswith("/index.php/acervo/detalhes/"):
+            filename = os.path.basename(path)
+        elif path.startswith("/fulltext/"):
+            filename = os.path.basename(path).replace(".html", "_full.html")
+        else:
+            return None, 0
+
+        fixture = os.path.join(self.fixtures_dir, filename)
+        if not os.path.isfile(fixture):
+            return None, 0
+        with open(fixture, "rb") as f:
+            return f.read(), os.path.getmtime(fixture)
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=0, fixtures_dir=FIXTURES_DIR, flaky=False):
+    """
+    Sobe o servidor de fixtures em uma thread
+
+    Returns:
+        (servidor, URL base para o --base-url do crawler); encerre com server.shutdown()
+    """
+    handler = type("Handler", (FixtureHandler,), {
+        "fixtures_dir": fixtures_dir, "flaky": flaky, "requests_seen": {}
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="fixture-server").start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def check(flaky=False):
+    """
+    Executa discover e crawl de ponta a ponta contra o servidor de fixtures
+
+    A primeira passada deve baixar os 4 artigos com título, ano e texto
+    completo; a segunda (como um --refresh) deve receber 304 em tudo.
+
+    Returns:
+        Lista de falhas (vazia se tudo conferiu)
+    """
+    server, base_url = serve(flaky=flaky)
+    failures = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = IngestManifest(os.path.join(tmp, "manifest.json"))
+            crawler = CapesCrawler(
+                base_url=base_url,
+                frontier_path=os.path.join(tmp, "frontier.json"),
+                max_workers=4,
+                requests_per_second=0,
+                backoff_factor=0,
+                manifest=manifest
+            )
+            articles = {}
+
+            def handle_article(article):
+                # Sem ChromaDB: só registra o artigo no manifesto, como a ingestão faria
+                articles[article["url"]] = article
+                manifest.commit(manifest.plan(
+                    article["url"], article["title"], article["fulldoc_url"],
+                    {"summary_index": [article["description"]] if article["description"] else None},
+                    article["validators"], article.get("publication_year")
+                ))
+
+            processed = crawler.crawl(pages=3, handle_article=handle_article)
+            years = sorted((article["publication_year"] or 0) for article in articles.values())
+            if processed != 4 or len(articles) != 4:
+                failures.append(f"esperados 4 artigos, processados {processed}")
+            if years != [0, 2016, 2019, 2021]:
+                failures.append(f"anos de publicação inesperados: {years}")
+            if not all(article["full_text"] and "Introdução" in article["full_text"] for article in articles.values()):
+                failures.append("texto completo ausente em algum artigo")
+            if crawler.frontier.failed:
+                failures.append(f"URLs com falha na fronteira: {crawler.frontier.failed}")
+
+            # Segunda passada com GET condicional: nada mudou
+            articles.clear()
+            crawler.requeue_done()
+            crawler.crawl(pages=3, handle_article=handle_article)
+            unchanged = [
+                article for article in articles.values()
+                if article["description"] is None and article["full_text"] is None
+            ]
+            if len(unchanged) != 4:
+                failures.append(f"esperados 4 artigos inalterados (304) na segunda passada, vieram {len(unchanged)}")
+    finally:
+        server.shutdown()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local com páginas de fixture do Portal de Periódicos CAPES")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Diretório com as páginas de fixture")
+    parser.add_argument("--flaky", action="store_true", help="Responde 503 à primeira requisição de cada caminho")
+    parser.add_argument("--check", action="store_true",
+                        help="Em vez de servir, executa discover e crawl de ponta a ponta e confere o resultado")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = check(flaky=args.flaky)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print("✅ Crawl de ponta a ponta contra as fixtures conferido")
+        sys.exit(0)
+
+    server, base_url = serve(args.host, args.port, args.fixtures, args.flaky)
+    print(f"Servindo as fixtures de {args.fixtures} em {base_url} (Ctrl+C para parar)")
+    print(f"python ingestion_module/ingest.py --mode crawl --base-url {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,5 +1,6 @@
 import sys
 import os
+import re
 
 # Adiciona o diretório raiz do projeto ao PATH
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -7,58 +8,108 @@ sys.path.insert(0, project_root)
 
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from rag_backend.models.chroma_vector_store import ChromaVectorStore
-from bs4 import BeautifulSoup
+from rag_backend.models.chroma_vector_store import ChromaVectorStore, CHROMA_DB_PATH
 import requests
-from langchain_community.document_loaders import WebBaseLoader
-from sentence_transformers import SentenceTransformer 
+import argparse
+import json
+from pipeline import IngestionPipeline
+from crawler import CapesCrawler, CAPES_BASE_URL, parse_article_page, parse_search_page
+from manifest import IngestManifest
 
 # Configurações do ChromaDB
 vector_store = ChromaVectorStore()
 
-# Função para indexar um chunk no ChromaDB
-def index_chunk(index_name, chunk, article_name, article_id, url):
-    body = {
+# Quantidade de chunks codificados e gravados por lote
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Manifesto com os hashes de conteúdo de cada artigo e chunk já ingerido
+manifest = IngestManifest(os.getenv("INGEST_MANIFEST_PATH", os.path.join(CHROMA_DB_PATH, "ingest_manifest.json")))
+
+INDEX_NAMES = ("summary_index", "full_document_index")
+
+# Monta o corpo de um chunk no formato esperado pelo ChromaVectorStore
+def build_chunk_body(chunk, article_name, article_id, url, chunk_index=None, content_hash=None, publication_year=None):
+    return {
         "article_name": article_name,
         "content": chunk,
         "article_fulldoc_url": url,
-        "article_id": article_id
+        "article_id": article_id,
+        "chunk_index": chunk_index,
+        "content_hash": content_hash,
+        "publication_year": publication_year
     }
+
+# Função para indexar um chunk no ChromaDB
+def index_chunk(index_name, chunk, article_name, article_id, url):
+    body = build_chunk_body(chunk, article_name, article_id, url)
     vector_store.index(index_name=index_name, id=article_id, body=body)
 
+# Função para indexar vários chunks no ChromaDB em lotes
+def index_chunks(index_name, chunks, batch_size=EMBEDDING_BATCH_SIZE):
+    """Recebe um iterável de tuplas (chunk, article_name, article_id, url[, chunk_index, content_hash, publication_year])"""
+    items = ((chunk[2], build_chunk_body(*chunk)) for chunk in chunks)
+    return vector_store.index_many(index_name=index_name, items=items, batch_size=batch_size)
+
+# Sufixos dos IDs anteriores ao manifesto: "{título}_summary_chunk_{i}", "{título}_full_chunk_{i}" e os do modo sample
+LEGACY_ID_SUFFIX_RE = re.compile(r"_(?:summary_chunk|full_chunk|sample_summary|sample_full)_\d+")
+
+def legacy_chunk_ids(index_name, title):
+    """IDs de chunks do artigo gravados no esquema antigo (por título), antes do manifesto"""
+    return [
+        id for id in vector_store.find_ids(index_name, where={"article_name": title})
+        if id.startswith(title) and LEGACY_ID_SUFFIX_RE.fullmatch(id[len(title):])
+    ]
+
+# Aplica as atualizações de metadados e remoções de um plano e o registra no manifesto
+def commit_article_sync(sync):
+    # Na primeira sincronização do artigo, os chunks com IDs antigos dão lugar aos novos
+    first_sync = manifest.get(sync.url) is None
+    for index_name in INDEX_NAMES:
+        vector_store.update_metadata(
+            index_name=index_name,
+            items=[(chunk[2], build_chunk_body(*chunk)) for name, chunk in sync.updates if name == index_name]
+        )
+        deletes = list(sync.deletes.get(index_name, []))
+        if first_sync:
+            deletes.extend(legacy_chunk_ids(index_name, sync.entry["title"]))
+        vector_store.delete(index_name=index_name, ids=deletes)
+    manifest.commit(sync)
+
+# Sincroniza um artigo com o ChromaDB, gravando apenas o que mudou
+def sync_article(url, title, fulldoc_url, parts, validators=None, publication_year=None):
+    """
+    parts: dicionário index_name -> lista de textos dos chunks (None = parte inalterada)
+    """
+    sync = manifest.plan(url, title, fulldoc_url, parts, validators, publication_year)
+    for index_name in INDEX_NAMES:
+        index_chunks(index_name=index_name, chunks=(chunk for name, chunk in sync.upserts if name == index_name))
+    commit_article_sync(sync)
+
+    deleted = sum(len(ids) for ids in sync.deletes.values())
+    if sync.changed:
+        print(f"Artigo '{title}': {len(sync.upserts)} chunks novos, {len(sync.updates)} atualizados, {deleted} removidos")
+    else:
+        print(f"Artigo '{title}' sem alterações")
+    return sync
+
 # Função para extrair o título do artigo da tag meta
 def extract_article_title_text_and_fulldocurl(url):
     response = requests.get(url)
     if response.status_code != 200:
         raise ValueError(f"Erro ao acessar a URL: {url}")    
-    soup = BeautifulSoup(response.text, "html.parser")
     
-    meta_tag = soup.find("meta", attrs={"name": "title"})
-    if not meta_tag or not meta_tag.get("content"):
-        raise ValueError("Não foi possível encontrar a meta tag com o título do artigo.")    
-    title = meta_tag.get("content")
+    title, description, href, publication_year = parse_article_page(response.text, url)
     print(f"Título: {title}")
-
-    meta_tag = soup.find("meta", attrs={"name": "description"})
-    if not meta_tag or not meta_tag.get("content"):
-        raise ValueError("Não foi possível encontrar a meta tag com a descrição do artigo.")    
-    description = meta_tag.get("content")
     print(f"Descrição: {description}")
+    print(f"Link 'Acessar': {href}")
+    print(f"Ano de publicação: {publication_year}")
 
-    button = soup.find("a", id="item-acessar")
-    if button and button.has_attr("href"):
-        href = button["href"]
-        print(f"Link 'Acessar' encontrado: {href}")
-    else:
-        print("Botão/link 'Acessar' não encontrado.")
-        href = url  # Fallback para a URL original
-
-    return title, description, href
+    return title, description, href, publication_year
 
 # Carrega os dados do website e processa os chunks
 def fetch_and_process_website_summary(url):
     # 1. Extrair o título do artigo
-    article_title, description, fulldoc_url = extract_article_title_text_and_fulldocurl(url)
+    article_title, description, fulldoc_url, publication_year = extract_article_title_text_and_fulldocurl(url)
     print(f"Título do artigo extraído: {article_title}")
 
     # 2. Dividir o conteúdo em chunks
@@ -67,17 +118,25 @@ def fetch_and_process_website_summary(url):
     chunks = text_splitter.split_documents([document])
     print(f"Dividiu os documentos em {len(chunks)} chunks.")
 
-    # 3. Ingerir os chunks no ChromaDB
-    for i, chunk in enumerate(chunks):
-        chunk_id = f"{article_title}_summary_chunk_{i}"
-        index_chunk(index_name="summary_index", chunk=chunk.page_content, article_id=chunk_id, article_name=article_title, url=fulldoc_url)
-        print(f"Indexou chunk de resumo com ID: {chunk_id}")
+    # 3. Ingerir os chunks no ChromaDB (apenas o que mudou desde a última execução)
+    sync_article(
+        url=url,
+        title=article_title,
+        fulldoc_url=fulldoc_url,
+        parts={"summary_index": [chunk.page_content for chunk in chunks]},
+        publication_year=publication_year
+    )
 
     # 4. Processar documento completo
-    fetch_and_process_website_full(url=fulldoc_url, article_title=article_title)    
+    fetch_and_process_website_full(
+        url=fulldoc_url, article_title=article_title, article_url=url, publication_year=publication_year
+    )    
 
 # Carrega os dados do website e processa os chunks
-def fetch_and_process_website_full(url, article_title):
+def fetch_and_process_website_full(url, article_title, article_url=None, publication_year=None):
+    # Importado aqui: os outros modos de ingestão não precisam do loader do langchain
+    from langchain_community.document_loaders import WebBaseLoader
+
     try:
         loader = WebBaseLoader(url)
         documents = loader.load()
@@ -87,41 +146,150 @@ def fetch_and_process_website_full(url, article_title):
         chunks = text_splitter.split_documents(documents)
         print(f"Dividiu os documentos completos em {len(chunks)} chunks.")
 
-        # Ingerir os chunks no ChromaDB
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{article_title}_full_chunk_{i}"
-            index_chunk(index_name="full_document_index", chunk=chunk.page_content, article_id=chunk_id, article_name=article_title, url=url)
-            print(f"Indexou chunk completo com ID: {chunk_id}")
+        # Ingerir os chunks no ChromaDB (apenas o que mudou desde a última execução)
+        sync_article(
+            url=article_url or url,
+            title=article_title,
+            fulldoc_url=url,
+            parts={"full_document_index": [chunk.page_content for chunk in chunks]},
+            publication_year=publication_year
+        )
 
         print(f"Todos os chunks foram ingeridos no ChromaDB.")
         
     except Exception as e:
         print(f"Erro ao processar documento completo: {e}")
 
-def extract_website_urls():
+def extract_website_urls(pages=2):
     capes_ia_search_url = "https://www.periodicos.capes.gov.br/index.php/acervo/buscador.html?q=intelig%C3%AAncia+artificial&source=&publishyear_min%5B%5D=1943&publishyear_max%5B%5D=2025&page="
     capes_ia_articles_urls = []
     
-    # Limitar a 2 páginas para teste (pode ser aumentado)
-    for i in range(2):
+    # Limitar a poucas páginas para teste (pode ser aumentado)
+    for i in range(pages):
         try:
             response = requests.get(capes_ia_search_url + str(i))
             if response.status_code != 200:
                 print(f"Erro ao acessar página {i}")
                 continue
                 
-            soup = BeautifulSoup(response.text, "html.parser")
-            links = soup.find_all('a', class_='titulo-busca')
-
-            for link in links:
-                url = "https://www.periodicos.capes.gov.br" + link.get('href')
-                capes_ia_articles_urls.append(url)
+            capes_ia_articles_urls.extend(parse_search_page(response.text))
                 
         except Exception as e:
             print(f"Erro ao processar página {i}: {e}")
     
     return capes_ia_articles_urls
 
+# Divide um artigo baixado pelo CapesCrawler nos textos dos chunks de cada índice
+def split_crawled_article(article):
+    """Retorna um dicionário index_name -> lista de textos (None = parte inalterada ou indisponível)"""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+    parts = {"summary_index": None, "full_document_index": None}
+
+    if article["description"] is not None:
+        summary_chunks = text_splitter.split_documents([
+            Document(page_content=article["description"], metadata={"title": article["title"], "article_fulldoc_url": article["fulldoc_url"]})
+        ])
+        parts["summary_index"] = [chunk.page_content for chunk in summary_chunks]
+
+    # Texto vazio indica falha no download: mantém os chunks já indexados
+    if article["full_text"]:
+        full_chunks = text_splitter.split_documents([
+            Document(page_content=article["full_text"], metadata={"source": article["fulldoc_url"], "title": article["title"]})
+        ])
+        parts["full_document_index"] = [chunk.page_content for chunk in full_chunks]
+
+    return parts
+
+# Compara um artigo baixado com o manifesto e retorna os chunks que precisam de embedding
+def plan_crawled_article(article):
+    """Retorna (lista de (index_name, chunk), plano de sincronização)"""
+    sync = manifest.plan(
+        url=article["url"],
+        title=article["title"],
+        fulldoc_url=article["fulldoc_url"],
+        parts=split_crawled_article(article),
+        validators=article.get("validators"),
+        publication_year=article.get("publication_year")
+    )
+    return sync.upserts, sync
+
+# Processa um artigo baixado pelo CapesCrawler (resumo + documento completo)
+def ingest_crawled_article(article):
+    sync_article(
+        url=article["url"],
+        title=article["title"],
+        fulldoc_url=article["fulldoc_url"],
+        parts=split_crawled_article(article),
+        validators=article.get("validators"),
+        publication_year=article.get("publication_year")
+    )
+
+def build_crawler(args):
+    crawler = CapesCrawler(
+        base_url=args.base_url,
+        frontier_path=args.frontier,
+        max_workers=args.workers,
+        per_host_concurrency=args.per_host,
+        requests_per_second=args.rps,
+        max_retries=args.retries,
+        manifest=manifest
+    )
+    if args.refresh:
+        # Revisita tudo; páginas inalteradas são resolvidas com GET condicional
+        crawler.requeue_done()
+    return crawler
+
+# Crawl concorrente e retomável do CAPES
+def crawl_capes(args):
+    crawler = build_crawler(args)
+    processed = crawler.crawl(pages=args.pages, handle_article=ingest_crawled_article, retry_failed=args.retry_failed)
+    manifest.save()
+    print(f"{processed} artigos ingeridos nesta execução")
+
+# Pipeline em estágios: download, parsing/chunking e embedding sobrepostos
+def run_pipeline(args):
+    crawler = build_crawler(args)
+    pipeline = IngestionPipeline(
+        crawler=crawler,
+        chunk_article=plan_crawled_article,
+        index_batch=lambda index_name, chunks: index_chunks(index_name=index_name, chunks=chunks, batch_size=args.batch_size),
+        commit_article=commit_article_sync,
+        fetchers=args.workers,
+        parsers=args.parsers,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size
+    )
+    report = pipeline.run(pages=args.pages, retry_failed=args.retry_failed)
+    manifest.save()
+
+    if args.metrics_file:
+        with open(args.metrics_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Métricas do pipeline salvas em {args.metrics_file}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingestão de dados no ChromaDB")
+    parser.add_argument("--mode", choices=["sample", "capes", "crawl", "pipeline"], default="sample",
+                        help="sample: dados de exemplo; capes: ingestão sequencial; crawl: crawler concorrente e retomável; "
+                             "pipeline: crawler com download, chunking e embedding sobrepostos")
+    parser.add_argument("--pages", type=int, default=2, help="Número de páginas de busca do CAPES")
+    parser.add_argument("--base-url", default=CAPES_BASE_URL, help="URL base do portal (útil para servidores locais de teste)")
+    parser.add_argument("--frontier", default="./crawl_frontier.json", help="Arquivo onde a fronteira de URLs é persistida")
+    parser.add_argument("--workers", type=int, default=8, help="Número de downloads simultâneos")
+    parser.add_argument("--per-host", type=int, default=4, help="Máximo de conexões simultâneas por host")
+    parser.add_argument("--rps", type=float, default=2.0, help="Máximo de requisições por segundo por host")
+    parser.add_argument("--retries", type=int, default=3, help="Tentativas por requisição (com backoff exponencial)")
+    parser.add_argument("--retry-failed", action="store_true", help="Tenta novamente artigos que falharam em execuções anteriores")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Revisita artigos já ingeridos; só o que mudou é baixado, recalculado e regravado")
+    parser.add_argument("--parsers", type=int, default=2, help="Threads de parsing/chunking no modo pipeline")
+    parser.add_argument("--queue-size", type=int, default=64, help="Tamanho das filas entre os estágios do pipeline")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Chunks por lote de embedding")
+    parser.add_argument("--metrics-file", default=None, help="Arquivo JSON para salvar as métricas do pipeline")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Expõe as métricas de indexação no formato do Prometheus nesta porta durante a ingestão")
+    return parser.parse_args()
+
 # Função para carregar dados de exemplo (para teste sem internet)
 def load_sample_data():
     """Carrega dados de exemplo para teste"""
@@ -153,44 +321,60 @@ def load_sample_data():
         }
     ]
     
-    for i, doc in enumerate(sample_docs):
-        # Indexar resumo
-        chunk_id = f"{doc['title']}_sample_summary_{i}"
-        index_chunk(
-            index_name="summary_index", 
-            chunk=doc['content'], 
-            article_id=chunk_id, 
-            article_name=doc['title'], 
-            url=doc['url']
+    # Planejar todos os documentos e indexar os chunks novos em lotes únicos
+    syncs = [
+        manifest.plan(
+            url=doc['url'],
+            title=doc['title'],
+            fulldoc_url=doc['url'],
+            parts={
+                "summary_index": [doc['content']],
+                "full_document_index": [doc['content'] * 3]  # Simular documento mais longo
+            }
         )
-        
-        # Indexar documento completo (simular documento mais longo)
-        chunk_id = f"{doc['title']}_sample_full_{i}"
-        index_chunk(
-            index_name="full_document_index", 
-            chunk=doc['content'] * 3,  # Simular documento mais longo
-            article_id=chunk_id, 
-            article_name=doc['title'], 
-            url=doc['url']
+        for doc in sample_docs
+    ]
+    for index_name in INDEX_NAMES:
+        index_chunks(
+            index_name=index_name,
+            chunks=(chunk for sync in syncs for name, chunk in sync.upserts if name == index_name)
         )
+    for sync in syncs:
+        commit_article_sync(sync)
+    manifest.save()
     
+    print(f"{sum(len(sync.upserts) for sync in syncs)} chunks novos indexados")
     print("Dados de exemplo carregados com sucesso no ChromaDB!")
 
 # Executa o processamento e ingestão
 if __name__ == "__main__":
+    args = parse_args()
     print("🚀 Iniciando ingestão de dados no ChromaDB...")
     
-    # Opção 1: Carregar dados de exemplo (para teste rápido)
-    load_sample_data()
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+        start_http_server(args.metrics_port)
+        print(f"📈 Métricas em http://0.0.0.0:{args.metrics_port}/metrics")
     
-    # Opção 2: Extrair dados reais do CAPES (descomente se quiser usar)
-    # website_urls = extract_website_urls()
-    # print(f"Encontradas {len(website_urls)} URLs")
-    # 
-    # for url in website_urls:
-    #     try:
-    #         fetch_and_process_website_summary(url)
-    #     except Exception as e:
-    #         print(f"Erro ao processar {url}: {e}")
+    if args.mode == "sample":
+        # Opção 1: Carregar dados de exemplo (para teste rápido)
+        load_sample_data()
+    elif args.mode == "capes":
+        # Opção 2: Extrair dados reais do CAPES sequencialmente
+        website_urls = extract_website_urls(pages=args.pages)
+        print(f"Encontradas {len(website_urls)} URLs")
+        
+        for url in website_urls:
+            try:
+                fetch_and_process_website_summary(url)
+            except Exception as e:
+                print(f"Erro ao processar {url}: {e}")
+        manifest.save()
+    elif args.mode == "crawl":
+        # Opção 3: Crawler concorrente com fronteira persistida
+        crawl_capes(args)
+    else:
+        # Opção 4: Pipeline em estágios com filas limitadas
+        run_pipeline(args)
     
-    print("✅ Ingestão concluída no ChromaDB!")
\ No newline at end of file
+    print("✅ Ingestão concluída no ChromaDB!")
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Sufixo usado nos IDs dos chunks de cada índice
+PART_SUFFIX = {
+    "summary_index": "summary",
+    "full_document_index": "full"
+}
+
+
+def content_hash(text):
+    """Hash estável do conteúdo de um texto"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def article_key(url):
+    """Chave curta e estável de um artigo, derivada da URL"""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+
+class ArticleSync:
+    """
+    Plano de sincronização de um artigo com o índice
+
+    Attributes:
+        upserts: Lista de (index_name, chunk) com conteúdo novo (precisa de embedding)
+        updates: Lista de (index_name, chunk) com conteúdo igual mas metadados novos
+        deletes: Dicionário index_name -> IDs de chunks que não existem mais
+    """
+
+    def __init__(self, url, entry):
+        self.url = url
+        self.entry = entry
+        self.upserts = []
+        self.updates = []
+        self.deletes = {}
+
+    @property
+    def changed(self):
+        return bool(self.upserts or self.updates or self.deletes)
+
+
+class IngestManifest:
+    """
+    Manifesto de ingestão com hashes de conteúdo por artigo e por chunk
+
+    Os IDs dos chunks são derivados do hash do conteúdo, então um chunk que
+    não mudou mantém o ID entre execuções e não é recalculado. O manifesto
+    também guarda os validadores HTTP (ETag/Last-Modified) de cada página
+    para que páginas inalteradas nem sejam baixadas de novo.
+    """
+
+    def __init__(self, path, save_interval=5.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._last_save = 0.0
+        self.articles = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.articles = json.load(f).get("articles", {})
+
+    def get(self, url):
+        with self._lock:
+            return self.articles.get(url)
+
+    def validator_headers(self, article_url, url):
+        """Cabeçalhos de GET condicional para uma página já ingerida do artigo"""
+        entry = self.get(article_url)
+        if not entry:
+            return {}
+        validators = entry.get("validators", {}).get(url, {})
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def plan(self, url, title, fulldoc_url, parts, validators=None, publication_year=None):
+        """
+        Compara o conteúdo atual de um artigo com o manifesto
+
+        Args:
+            url: URL do artigo (chave do manifesto)
+            title: Título do artigo
+            fulldoc_url: URL do documento completo
+            parts: Dicionário index_name -> lista de textos dos chunks, em ordem.
+                   None indica que a parte não mudou (ex.: resposta 304)
+            validators: Dicionário URL -> {"etag", "last_modified"}
+            publication_year: Ano de publicação do artigo (None se desconhecido)
+
+        Returns:
+            ArticleSync com o que precisa ser gravado e removido
+        """
+        old = self.get(url) or {}
+        old_parts = old.get("parts", {})
+        metadata_changed = (
+            old.get("title") != title
+            or old.get("fulldoc_url") != fulldoc_url
+            or old.get("publication_year") != publication_year
+        )
+
+        entry = {
+            "title": title,
+            "fulldoc_url": fulldoc_url,
+            "publication_year": publication_year,
+            "validators": {**old.get("validators", {}), **(validators or {})},
+            "parts": dict(old_parts),
+            "updated_at": time.time()
+        }
+        sync = ArticleSync(url, entry)
+        key = article_key(url)
+
+        for index_name, texts in parts.items():
+            if texts is None:
+                continue
+
+            old_part = old_parts.get(index_name, {"hash": None, "chunks": {}})
+            part_hash = content_hash("\x1e".join(texts))
+            if part_hash == old_part["hash"] and not metadata_changed:
+                continue
+
+            suffix = PART_SUFFIX.get(index_name, index_name)
+            new_chunks = {}
+            occurrences = Counter()
+            for i, text in enumerate(texts):
+                chunk_hash = content_hash(text)
+                # Chunks idênticos no mesmo artigo recebem um contador para não colidir
+                n = occurrences[chunk_hash]
+                occurrences[chunk_hash] += 1
+                chunk_id = f"{key}_{suffix}_{chunk_hash[:16]}" + (f"_{n}" if n else "")
+                new_chunks[chunk_id] = i
+
+                chunk = (text, title, chunk_id, fulldoc_url, i, chunk_hash, publication_year)
+                if chunk_id not in old_part["chunks"]:
+                    sync.upserts.append((index_name, chunk))
+                elif old_part["chunks"][chunk_id] != i or metadata_changed:
+                    sync.updates.append((index_name, chunk))
+
+            removed = [chunk_id for chunk_id in old_part["chunks"] if chunk_id not in new_chunks]
+            if removed:
+                sync.deletes[index_name] = removed
+            entry["parts"][index_name] = {"hash": part_hash, "chunks": new_chunks}
+
+        return sync
+
+    def commit(self, sync):
+        """Registra no manifesto um plano que já foi aplicado ao índice"""
+        with self._lock:
+            self.articles[sync.url] = sync.entry
+            if time.monotonic() - self._last_save < self.save_interval:
+                return
+            self._last_save = time.monotonic()
+        self.save()
+
+    def save(self):
+        """Grava o manifesto de forma atômica (arquivo temporário único + rename, uma gravação por vez)"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                state = {"articles": dict(self.articles)}
+                self._last_save = time.monotonic()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.")
+            try:
+                with open(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
@@ -0,0 +1,281 @@
+import queue
+import threading
+import time
+
+# Marcador de fim de fila entre os estágios
+_STOP = object()
+
+
+class StageMetrics:
+    """Métricas de um estágio do pipeline"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0   # tempo esperando entrada (estágio anterior lento)
+        self.blocked_seconds = 0.0   # tempo esperando espaço na saída (backpressure)
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def add(self, items=0, errors=0, busy=0.0, starved=0.0, blocked=0.0):
+        with self._lock:
+            self.items += items
+            self.errors += errors
+            self.busy_seconds += busy
+            self.starved_seconds += starved
+            self.blocked_seconds += blocked
+
+    def observe_queue(self, depth):
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def snapshot(self, elapsed):
+        with self._lock:
+            capacity = max(elapsed * self.workers, 1e-9)
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "items": self.items,
+                "errors": self.errors,
+                "items_per_second": round(self.items / max(elapsed, 1e-9), 2),
+                "utilization": round(self.busy_seconds / capacity, 3),
+                "starved_ratio": round(self.starved_seconds / capacity, 3),
+                "backpressure_ratio": round(self.blocked_seconds / capacity, 3),
+                "max_input_queue_depth": self.max_queue_depth
+            }
+
+
+class IngestionPipeline:
+    """
+    Pipeline de ingestão em estágios com filas limitadas
+
+    fetch (N threads de rede) -> parse/chunk (M threads) -> embed (1 thread em lotes)
+
+    As filas limitadas fazem o backpressure: quando o embedding não acompanha,
+    os estágios anteriores bloqueiam em vez de acumular artigos na memória.
+    O estágio de embedding agrupa chunks de vários artigos em um único lote
+    para o modelo e para o ChromaDB.
+
+    Args:
+        crawler: CapesCrawler usado para descobrir e baixar os artigos
+        chunk_article: Função artigo -> (lista de (index_name, chunk), contexto)
+        index_batch: Função (index_name, lista de chunks) que grava um lote
+        commit_article: Função opcional chamada com o contexto de cada artigo
+                        depois que todos os seus chunks foram gravados
+    """
+
+    def __init__(self, crawler, chunk_article, index_batch, commit_article=None, fetchers=8,
+                 parsers=2, queue_size=64, batch_size=64, flush_interval=2.0, report_interval=10.0):
+        self.crawler = crawler
+        self.chunk_article = chunk_article
+        self.index_batch = index_batch
+        self.commit_article = commit_article
+        self.fetchers = fetchers
+        self.parsers = parsers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.report_interval = report_interval
+
+        self.url_queue = queue.Queue()
+        self.parse_queue = queue.Queue(maxsize=queue_size)
+        self.embed_queue = queue.Queue(maxsize=queue_size)
+
+        self.metrics = {
+            "fetch": StageMetrics("fetch", fetchers),
+            "parse": StageMetrics("parse", parsers),
+            "embed": StageMetrics("embed", 1)
+        }
+        self._started_at = None
+        self._finished = threading.Event()
+
+    def _get(self, q, metrics):
+        start = time.perf_counter()
+        item = q.get()
+        metrics.add(starved=time.perf_counter() - start)
+        metrics.observe_queue(q.qsize())
+        return item
+
+    def _put(self, q, item, metrics):
+        start = time.perf_counter()
+        q.put(item)
+        metrics.add(blocked=time.perf_counter() - start)
+
+    def _mark_done(self, url):
+        """Registra a URL como concluída; um erro de gravação da fronteira não derruba o estágio"""
+        try:
+            self.crawler.frontier.mark_done(url)
+        except Exception as e:
+            print(f"Erro ao registrar {url} como concluída: {e}")
+
+    def _mark_failed(self, url, error):
+        try:
+            self.crawler.frontier.mark_failed(url, error)
+        except Exception as e:
+            print(f"Erro ao registrar a falha de {url}: {e}")
+
+    def _fetch_worker(self):
+        metrics = self.metrics["fetch"]
+        while True:
+            url = self._get(self.url_queue, metrics)
+            if url is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                article = self.crawler.fetch_article(url)
+                metrics.add(items=1, busy=time.perf_counter() - start)
+            except Exception as e:
+                metrics.add(errors=1, busy=time.perf_counter() - start)
+                print(f"Erro ao baixar {url}: {e}")
+                self._mark_failed(url, e)
+                continue
+            self._put(self.parse_queue, article, metrics)
+
+    def _parse_worker(self):
+        metrics = self.metrics["parse"]
+        while True:
+            article = self._get(self.parse_queue, metrics)
+            if article is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                chunks, context = self.chunk_article(article)
+                metrics.add(items=1, busy=time.perf_counter() - start)
+            except Exception as e:
+                metrics.add(errors=1, busy=time.perf_counter() - start)
+                print(f"Erro ao processar {article.get('url')}: {e}")
+                self._mark_failed(article.get("url"), e)
+                continue
+            self._put(self.embed_queue, (article["url"], chunks, context), metrics)
+
+    def _embed_worker(self):
+        """Único consumidor: acumula chunks de vários artigos e grava em lotes"""
+        metrics = self.metrics["embed"]
+        buffers = {}
+        buffered = 0
+        pending_articles = []
+        last_flush = time.perf_counter()
+
+        def flush():
+            nonlocal buffered, last_flush
+            start = time.perf_counter()
+            committed = 0
+            try:
+                for index_name, chunks in buffers.items():
+                    if chunks:
+                        self.index_batch(index_name, chunks)
+                for url, context in pending_articles:
+                    if self.commit_article:
+                        self.commit_article(context)
+                    committed += 1
+                    self._mark_done(url)
+                metrics.add(items=buffered, busy=time.perf_counter() - start)
+            except Exception as e:
+                metrics.add(errors=1, busy=time.perf_counter() - start)
+                print(f"Erro ao indexar lote: {e}")
+                # Artigos já registrados no manifesto continuam concluídos
+                for url, _ in pending_articles[committed:]:
+                    self._mark_failed(url, e)
+            buffers.clear()
+            pending_articles.clear()
+            buffered = 0
+            last_flush = time.perf_counter()
+
+        while True:
+            start = time.perf_counter()
+            try:
+                item = self.embed_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                metrics.add(starved=time.perf_counter() - start)
+                if pending_articles:
+                    flush()
+                continue
+            metrics.add(starved=time.perf_counter() - start)
+            metrics.observe_queue(self.embed_queue.qsize())
+
+            if item is _STOP:
+                if buffered or pending_articles:
+                    flush()
+                return
+
+            url, chunks, context = item
+            for index_name, chunk in chunks:
+                buffers.setdefault(index_name, []).append(chunk)
+            buffered += len(chunks)
+            pending_articles.append((url, context))
+
+            if buffered >= self.batch_size or time.perf_counter() - last_flush >= self.flush_interval:
+                flush()
+
+    def _reporter(self):
+        while not self._finished.wait(self.report_interval):
+            self.print_report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self._started_at
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "stages": [metrics.snapshot(elapsed) for metrics in self.metrics.values()],
+            "queue_depth": {
+                "fetch": self.url_queue.qsize(),
+                "parse": self.parse_queue.qsize(),
+                "embed": self.embed_queue.qsize()
+            }
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"⏱️  Pipeline: {report['elapsed_seconds']}s")
+        for stage in report["stages"]:
+            print(
+                f"   {stage['stage']:>5}: {stage['items']} itens ({stage['items_per_second']}/s), "
+                f"utilização {stage['utilization']:.0%}, ocioso {stage['starved_ratio']:.0%}, "
+                f"backpressure {stage['backpressure_ratio']:.0%}, fila máx {stage['max_input_queue_depth']}, "
+                f"erros {stage['errors']}"
+            )
+
+    def run(self, pages, retry_failed=False):
+        """
+        Executa o pipeline sobre os artigos pendentes da fronteira
+
+        Returns:
+            Relatório final com as métricas de cada estágio
+        """
+        if retry_failed:
+            self.crawler.frontier.retry_failed(kind="article")
+        self.crawler.discover(pages)
+
+        urls = self.crawler.frontier.pending_urls("article")
+        print(f"{len(urls)} artigos pendentes na fronteira")
+        for url in urls:
+            self.url_queue.put(url)
+        for _ in range(self.fetchers):
+            self.url_queue.put(_STOP)
+
+        self._started_at = time.perf_counter()
+        self._finished.clear()
+        reporter = threading.Thread(target=self._reporter, daemon=True)
+        reporter.start()
+
+        fetch_threads = [threading.Thread(target=self._fetch_worker, daemon=True) for _ in range(self.fetchers)]
+        parse_threads = [threading.Thread(target=self._parse_worker, daemon=True) for _ in range(self.parsers)]
+        embed_thread = threading.Thread(target=self._embed_worker, daemon=True)
+        for thread in fetch_threads + parse_threads + [embed_thread]:
+            thread.start()
+
+        # Encerramento em cascata: cada estágio termina quando o anterior acaba
+        for thread in fetch_threads:
+            thread.join()
+        for _ in range(self.parsers):
+            self.parse_queue.put(_STOP)
+        for thread in parse_threads:
+            thread.join()
+        self.embed_queue.put(_STOP)
+        embed_thread.join()
+
+        self._finished.set()
+        self.crawler.frontier.save()
+        self.print_report()
+        return self.report()
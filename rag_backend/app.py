@@ -1,46 +1,231 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from models.chroma_vector_store import ChromaVectorStore
 from models.generate_local import LocalLLMClient
+from models.answer_cache import AnswerCache
+from models.hits import format_hits
+from models.reranker import RERANK_ENABLED
+from models.semantic_cache import SemanticQueryCache
+from models.metrics import span, start_request_timing, finish_request_timing, render_metrics, REQUEST_SECONDS
 import json
 import os
+import threading
+import time
 
 app = Flask(__name__)
 CORS(app)
 
-# Inicializar ChromaDB e LLM local
-vector_store = ChromaVectorStore()
-llm_client = LocalLLMClient()
+# LLM local (o modelo é carregado no warmup ou no primeiro uso). LLM_CLIENT=stub usa
+# um gerador determinístico com latência configurável, para testes de carga
+LLM_CLIENT = os.getenv("LLM_CLIENT", "local")
+if LLM_CLIENT == "stub":
+    from models.stub_llm import StubLLMClient
+    llm_client = StubLLMClient()
+else:
+    llm_client = LocalLLMClient()
 
-def document_retrieval(query, search_type="hybrid"):
-    """Recupera documentos com busca híbrida ChromaDB"""
-    orchestrator = llm_client.orchestrator(query=query)
+# ChromaDB é aberto no primeiro uso (ver get_vector_store), para o servidor subir antes
+vector_store = None
+_vector_store_lock = threading.Lock()
+
+# Trechos recuperados para o prompt do /rag (com RERANK_ENABLED=1 pode ser menor:
+# o cross-encoder escolhe os k entre RERANK_CANDIDATES candidatos)
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+
+# Máximo de queries por requisição em /search/batch
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "256"))
+
+# Carregamento dos modelos: "background" (padrão, /health responde na hora e /ready
+# indica quando terminou), "sync" (antes de atender; usado pelo gunicorn com preload)
+# ou "off" (cada modelo é carregado na primeira requisição que precisar dele)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+warmup_status = {"state": "pending", "vector_store": False, "embedding_model": False, "llm": False, "seconds": None, "error": None}
+
+# Cache de respostas do /rag (memória + camada opcional em SQLite)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+answer_cache = AnswerCache(
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")) or None,
+    disk_path=os.getenv("ANSWER_CACHE_PATH") or None,
+    disk_max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+)
+
+# Cache semântico: queries parecidas (cosseno >= limiar) reaproveitam a busca e,
+# com SEMANTIC_CACHE_ANSWERS=1, a resposta; invalidado quando as coleções mudam
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_ANSWERS = os.getenv("SEMANTIC_CACHE_ANSWERS", "0") == "1"
+semantic_cache = SemanticQueryCache(
+    maxsize=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")) or None
+)
+
+def get_vector_store():
+    """Retorna o ChromaVectorStore, abrindo o ChromaDB na primeira chamada"""
+    global vector_store
+    if vector_store is None:
+        with _vector_store_lock:
+            if vector_store is None:
+                from models.chroma_vector_store import ChromaVectorStore
+                vector_store = ChromaVectorStore()
+    return vector_store
+
+def warm_up():
+    """Abre o ChromaDB e carrega os modelos, atualizando warmup_status"""
+    start = time.perf_counter()
+    warmup_status["state"] = "loading"
+    try:
+        store = get_vector_store()
+        warmup_status["vector_store"] = True
+        store.load_model()
+        warmup_status["embedding_model"] = True
+        if RERANK_ENABLED:
+            store.reranker.load()
+            warmup_status["reranker"] = True
+        llm_client.load()
+        warmup_status["llm"] = True
+        warmup_status["state"] = "ready"
+    except Exception as e:
+        print(f"Erro no warmup: {e}")
+        warmup_status["state"] = "failed"
+        warmup_status["error"] = str(e)
+    warmup_status["seconds"] = round(time.perf_counter() - start, 2)
+
+def start_warmup():
+    if MODEL_WARMUP == "sync":
+        warm_up()
+    elif MODEL_WARMUP == "background":
+        threading.Thread(target=warm_up, name="model-warmup", daemon=True).start()
+    else:
+        warmup_status["state"] = "lazy"
+
+def reopen_connections():
+    """Reabre ChromaDB e caches SQLite em um worker criado por fork (ver gunicorn.conf.py)"""
+    if vector_store is not None:
+        vector_store.reopen()
+    answer_cache.reopen()
+
+@app.before_request
+def begin_request_metrics():
+    g.request_start = time.perf_counter()
+    start_request_timing()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(
+        time.perf_counter() - g.request_start
+    )
+    return response
+
+def parse_year_range(value):
+    """
+    Converte o campo "year_range" da requisição ([inicio, fim], qualquer um
+    pode ser null) na tupla usada pelo vector store
+
+    Raises:
+        ValueError: Se o valor não for uma lista de dois anos
+    """
+    if value is None:
+        return None
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError("year_range must be [start, end]")
+    try:
+        start, end = (int(year) if year is not None else None for year in value)
+    except (TypeError, ValueError):
+        raise ValueError("year_range must contain years or null")
+    if start is not None and end is not None and start > end:
+        raise ValueError("year_range start must not be after end")
+    return start, end
+
+def document_retrieval(query, search_type="hybrid", index_names=("summary_index",), timeout_ms=None, orchestrator=None,
+                       year_range=None):
+    """
+    Recupera documentos com busca híbrida ChromaDB
+
+    As sub-consultas (semântica, léxica e uma por índice em index_names) rodam
+    em paralelo, limitadas pelo prazo timeout_ms. Com year_range, só artigos
+    publicados na faixa de anos são considerados.
+
+    Returns:
+        (retrieved_docs, hits): dicionário artigo -> texto da API e os Hits
+        ranqueados (com scores), usados para montar o prompt
+    """
+    if orchestrator is None:
+        with span("orchestrator"):
+            orchestrator = llm_client.orchestrator(query=query)
     print(f"Orchestrator: {orchestrator}")
     
     if "agent_general_search" in orchestrator:
-        keywords = llm_client.generate_keywords(query=query)
+        with span("generate_keywords"):
+            keywords = llm_client.generate_keywords(query=query)
         print(f"Keywords: {keywords}")
-        retrieved_docs = vector_store.search(
-            index_name='summary_index', 
-            query=keywords,
-            search_type=search_type
-        )        
+        with span("search"):
+            hits = get_vector_store().search_indexes(
+                index_names=list(index_names), 
+                query=keywords,
+                k=RAG_TOP_K,
+                search_type=search_type,
+                timeout_ms=timeout_ms,
+                rerank_query=query,
+                year_range=year_range
+            )        
     elif "agent_specific_search" in orchestrator:
         filename = orchestrator.split(":")[-1].strip()
         query = query.replace(filename, "")
         print(f"Pesquisa específica no artigo: {filename}, procurando: {query}")
-        retrieved_docs = vector_store.search_specific(
-            index_name="full_document_index", 
-            query=query, 
-            filename=filename
-        )
+        with span("search_specific"):
+            hits = get_vector_store().search_specific(
+                index_name="full_document_index", 
+                query=query, 
+                filename=filename,
+                year_range=year_range
+            )
+
+    with span("format_results"):
+        return format_hits(hits), hits
 
-    return retrieved_docs
+def cached_document_retrieval(query, search_type="hybrid", index_names=("summary_index",), year_range=None):
+    """
+    document_retrieval com o cache semântico na frente
 
-def get_llm_response(retrieved_docs, query):
+    A decisão do orquestrador (que inclui o artigo da busca específica), o
+    tipo de busca, os índices e a faixa de anos formam o escopo: só queries
+    parecidas com o mesmo escopo compartilham resultados.
+
+    Returns:
+        (retrieved_docs, hits, entry, reused): entry é a entrada do cache (nova
+        ou reaproveitada, None se o cache estiver desligado) e reused indica
+        se a busca foi evitada
+    """
+    with span("orchestrator"):
+        orchestrator = llm_client.orchestrator(query=query)
+    if not SEMANTIC_CACHE_ENABLED:
+        retrieved_docs, hits = document_retrieval(
+            query, search_type, index_names, orchestrator=orchestrator, year_range=year_range
+        )
+        return retrieved_docs, hits, None, False
+    
+    store = get_vector_store()
+    scope = (orchestrator, search_type, tuple(index_names), year_range)
+    version = store.data_version()
+    with span("semantic_cache"):
+        embedding = store.encode_query(query)
+        entry, similarity = semantic_cache.get(embedding, scope, version)
+    if entry is not None:
+        print(f"Cache semântico: '{query}' ~ '{entry.query}' ({similarity:.3f})")
+        return entry.retrieved_docs, entry.hits, entry, True
+    
+    retrieved_docs, hits = document_retrieval(
+        query, search_type, index_names, orchestrator=orchestrator, year_range=year_range
+    )
+    entry = semantic_cache.put(embedding, scope, query, retrieved_docs, hits, version) if retrieved_docs else None
+    return retrieved_docs, hits, entry, False
+
+def get_llm_response(retrieved_docs, query, hits=None):
     """Gera resposta do LLM local"""
     answer = ''
-    llm_response = llm_client.generate_answer(retrieved_docs, query)
+    with span("generate_answer"):
+        llm_response = llm_client.generate_answer(retrieved_docs, query, hits=hits)
     
     try:
         if isinstance(llm_response, str):
@@ -64,30 +249,126 @@ def rag():
     """Endpoint principal para RAG com ChromaDB"""
     query = request.json.get("query", "")
     search_type = request.json.get("search_type", "hybrid")  # semantic, lexical, hybrid
+    index_names = request.json.get("index_names", ["summary_index"])  # um ou ambos os índices
     
     if not query:
         return jsonify({"error": "No query provided"}), 400
+    try:
+        year_range = parse_year_range(request.json.get("year_range"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        retrieved_docs = document_retrieval(query=query, search_type=search_type)
+        retrieved_docs, hits, entry, reused = cached_document_retrieval(
+            query=query, search_type=search_type, index_names=index_names, year_range=year_range
+        )
 
         if not retrieved_docs:
             return jsonify({"error": "No relevant documents found"}), 404
         
-        answer = get_llm_response(retrieved_docs=retrieved_docs, query=query)
+        # Query parecida com uma já respondida: reaproveita a resposta dela
+        answer = entry.answer if reused and SEMANTIC_CACHE_ANSWERS else None
+        
+        # A chave inclui os documentos recuperados: se o índice mudar, a resposta é gerada de novo
+        cache_key = AnswerCache.make_key(query, search_type, retrieved_docs)
+        if answer is None and ANSWER_CACHE_ENABLED:
+            answer = answer_cache.get(cache_key)
+        cached = answer is not None
+        
+        if not cached:
+            answer = get_llm_response(retrieved_docs=retrieved_docs, query=query, hits=hits)
+            if ANSWER_CACHE_ENABLED:
+                answer_cache.put(cache_key, answer)
+        if entry is not None and entry.answer is None:
+            entry.answer = answer
 
-        return jsonify({
+        response = {
             "query": query,
             "search_type": search_type,
             "documents": retrieved_docs,
             "answer": answer,
+            "cached": cached,
+            "semantic_cache_hit": reused,
             "backend": "chromadb"
-        })   
+        }
+        if request.json.get("timing"):
+            response["timing"] = finish_request_timing()
+        return jsonify(response)   
 
     except Exception as e:
         print(f"Error: {e}") 
         return jsonify({"error": str(e)}), 500
 
+def sse_event(event, data):
+    """Formata uma mensagem server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route("/rag/stream", methods=["POST"])
+def rag_stream():
+    """
+    RAG com resposta em streaming (server-sent events)
+
+    Eventos: "documents" (assim que a busca termina), "token" (um por trecho
+    gerado), "done" (resposta completa e tempos) e "error".
+    """
+    query = request.json.get("query", "")
+    search_type = request.json.get("search_type", "hybrid")
+    index_names = request.json.get("index_names", ["summary_index"])
+    
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    try:
+        year_range = parse_year_range(request.json.get("year_range"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def events():
+        start = time.perf_counter()
+        try:
+            retrieved_docs, hits, _, _ = cached_document_retrieval(
+                query=query, search_type=search_type, index_names=index_names, year_range=year_range
+            )
+            retrieval_ms = (time.perf_counter() - start) * 1000
+            
+            if not retrieved_docs:
+                yield sse_event("error", {"error": "No relevant documents found"})
+                return
+            
+            yield sse_event("documents", {
+                "query": query,
+                "search_type": search_type,
+                "documents": retrieved_docs,
+                "backend": "chromadb"
+            })
+            
+            parts = []
+            first_token_ms = None
+            for text in llm_client.stream_answer(retrieved_docs, query, hits=hits):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            
+            answer = "".join(parts).strip()
+            yield sse_event("done", {
+                "answer": f"<strong>Resposta:</strong> {answer}<br /><br />",
+                "timing": {
+                    "retrieval_ms": round(retrieval_ms, 1),
+                    "first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+                    "total_ms": round((time.perf_counter() - start) * 1000, 1)
+                }
+            })
+        
+        except Exception as e:
+            print(f"Error: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check"""
@@ -97,18 +378,34 @@ def health_check():
         "backend": "chromadb"
     })
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Métricas no formato do Prometheus (etapas, requisições e geração)"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route("/ready", methods=["GET"])
+def readiness_check():
+    """Readiness: 200 quando os modelos estão carregados, 503 enquanto carregam"""
+    ready = warmup_status["state"] in ("ready", "lazy")
+    return jsonify(dict(warmup_status, ready=ready)), 200 if ready else 503
+
 @app.route("/stats", methods=["GET"])
 def get_stats():
     """Retorna estatísticas do ChromaDB"""
     try:
+        store = get_vector_store()
         stats = {
-            "summary_index": vector_store.get_collection_stats("summary_index"),
-            "full_document_index": vector_store.get_collection_stats("full_document_index")
+            "summary_index": store.get_collection_stats("summary_index"),
+            "full_document_index": store.get_collection_stats("full_document_index")
         }
         
         return jsonify({
             "backend": "chromadb",
-            "stats": stats
+            "stats": stats,
+            "answer_cache": dict(answer_cache.stats(), enabled=ANSWER_CACHE_ENABLED),
+            "reranker": dict(store.reranker.stats(), enabled=RERANK_ENABLED),
+            "semantic_cache": dict(semantic_cache.stats(), enabled=SEMANTIC_CACHE_ENABLED, answers=SEMANTIC_CACHE_ANSWERS)
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -118,37 +415,101 @@ def search_only():
     """Endpoint apenas para busca (sem geração de resposta)"""
     query = request.json.get("query", "")
     search_type = request.json.get("search_type", "hybrid")
-    index_name = request.json.get("index_name", "summary_index")
+    index_name = request.json.get("index_name", "summary_index")  # nome ou lista de índices
     k = request.json.get("k", 5)
     
     if not query:
         return jsonify({"error": "No query provided"}), 400
+    try:
+        year_range = parse_year_range(request.json.get("year_range"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        results = vector_store.search(
-            index_name=index_name,
+        hits = get_vector_store().search_indexes(
+            index_names=index_name if isinstance(index_name, list) else [index_name],
             query=query,
             k=k,
-            search_type=search_type
+            search_type=search_type,
+            rerank=request.json.get("rerank"),  # None: padrão RERANK_ENABLED
+            year_range=year_range
         )
+        with span("format_results"):
+            results = format_hits(hits)
         
-        return jsonify({
+        response = {
             "query": query,
             "search_type": search_type,
             "index_name": index_name,
             "k": k,
             "results": results,
             "backend": "chromadb"
+        }
+        if request.json.get("include_hits"):
+            # Trechos individuais com ID, score e posição no artigo
+            response["hits"] = [hit.to_dict() for hit in hits]
+        if request.json.get("timing"):
+            response["timing"] = finish_request_timing()
+        return jsonify(response)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/search/batch", methods=["POST"])
+def search_batch():
+    """Busca várias queries em uma requisição (codificação e consulta em lote)"""
+    queries = request.json.get("queries", [])
+    search_type = request.json.get("search_type", "hybrid")
+    index_name = request.json.get("index_name", "summary_index")
+    k = request.json.get("k", 5)
+    
+    if not queries or not isinstance(queries, list):
+        return jsonify({"error": "No queries provided"}), 400
+    if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch"}), 400
+    try:
+        year_range = parse_year_range(request.json.get("year_range"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        hit_lists = get_vector_store().search_batch(
+            index_name=index_name,
+            queries=queries,
+            k=k,
+            search_type=search_type,
+            year_range=year_range
+        )
+        
+        return jsonify({
+            "search_type": search_type,
+            "index_name": index_name,
+            "k": k,
+            "results": [
+                {"query": query, "results": format_hits(hits)}
+                for query, hits in zip(queries, hit_lists)
+            ],
+            "backend": "chromadb"
         })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# No modo debug, o processo pai do reloader só reinicia o servidor e não carrega os modelos
+FLASK_DEBUG = os.getenv("FLASK_DEBUG", "1") == "1"
+if __name__ != "__main__" or not FLASK_DEBUG or os.getenv("WERKZEUG_RUN_MAIN") == "true":
+    start_warmup()
+
 if __name__ == "__main__":
     print("🚀 Iniciando Academ.ia com ChromaDB")
     print("✅ Backend: ChromaDB (busca híbrida)")
     print("✅ LLM: Local (DialoGPT)")
     print("✅ Custo: Zero")
     
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # Servidor de desenvolvimento; em produção use gunicorn (ver gunicorn.conf.py)
+    app.run(
+        debug=FLASK_DEBUG,
+        host=os.getenv("FLASK_HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "5000"))
+    )
 
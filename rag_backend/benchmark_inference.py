@@ -0,0 +1,243 @@
+"""
+Verificação de paridade e benchmark dos backends de inferência
+
+Cada backend roda em um subprocesso separado, para que o RSS medido seja
+apenas o do modelo carregado. Os resultados são comparados com o backend
+pytorch (fp32).
+
+Uso:
+    cd rag_backend
+    python benchmark_inference.py --component all --backends pytorch quantized onnx --output inference_benchmark.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SAMPLE_TEXTS = [
+    "A inteligência artificial está revolucionando a educação através de sistemas adaptativos.",
+    "O machine learning tem aplicações importantes na medicina, incluindo diagnóstico precoce.",
+    "Chatbots modernos utilizam técnicas avançadas de processamento de linguagem natural.",
+    "A ética em inteligência artificial é fundamental para o desenvolvimento responsável.",
+    "Redes neurais profundas são a base do deep learning moderno.",
+    "Quais são as tendências em IA?",
+    "Mostre artigos sobre inteligência artificial na educação",
+    "Quais metodologias são mencionadas no artigo sobre machine learning?"
+]
+
+# Limiares de paridade em relação ao fp32
+MIN_EMBEDDING_COSINE = 0.99
+MIN_TOKEN_AGREEMENT = 0.9
+
+
+def current_rss_mb():
+    """RSS atual do processo em MB (Linux), ou o pico via resource"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def run_embedding_worker(backend, runs, batch_size, outputs_path):
+    from models.chroma_vector_store import EMBEDDING_MODEL_NAME
+    from models.inference_backend import load_sentence_transformer
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model = load_sentence_transformer(EMBEDDING_MODEL_NAME, backend)
+    load_seconds = time.perf_counter() - start
+
+    model.encode(SAMPLE_TEXTS[:2])  # aquecimento
+
+    latencies = []
+    for _ in range(runs):
+        for text in SAMPLE_TEXTS:
+            start = time.perf_counter()
+            model.encode(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    batch = SAMPLE_TEXTS * max(1, batch_size // len(SAMPLE_TEXTS))
+    start = time.perf_counter()
+    for _ in range(runs):
+        model.encode(batch, batch_size=batch_size)
+    throughput = len(batch) * runs / (time.perf_counter() - start)
+
+    np.save(outputs_path, np.asarray(model.encode(SAMPLE_TEXTS), dtype=np.float32))
+
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "latency_ms_p50": round(percentile(latencies, 50), 2),
+        "latency_ms_p95": round(percentile(latencies, 95), 2),
+        "throughput_texts_per_second": round(throughput, 1),
+        "rss_mb": round(current_rss_mb(), 1),
+        "model_rss_mb": round(current_rss_mb() - rss_before, 1)
+    }
+
+
+def run_llm_worker(backend, runs, max_new_tokens, outputs_path):
+    import torch
+    from transformers import AutoTokenizer
+    from models.generate_local import LLM_MODEL_NAME
+    from models.inference_backend import backend_device, load_causal_lm
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL_NAME)
+    model = load_causal_lm(LLM_MODEL_NAME, backend)
+    device = backend_device(backend)
+    model.to(device)
+    load_seconds = time.perf_counter() - start
+
+    prompts = [f"Pergunta: {text}\nResposta:" for text in SAMPLE_TEXTS]
+    latencies = []
+    generated_tokens = 0
+    greedy_tokens = []
+    last_logits = []
+
+    with torch.no_grad():
+        for run in range(runs + 1):
+            for prompt in prompts:
+                inputs = tokenizer(prompt, return_tensors="pt").to(device)
+                start = time.perf_counter()
+                outputs = model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.eos_token_id
+                )
+                elapsed = time.perf_counter() - start
+                new_tokens = outputs[0][inputs["input_ids"].shape[1]:].tolist()
+
+                if run == 0:
+                    # Primeira rodada: aquecimento e saídas para a verificação de paridade
+                    greedy_tokens.append(new_tokens)
+                    logits = model(**inputs).logits[0, -1]
+                    last_logits.append(torch.log_softmax(logits.float(), dim=-1).cpu().numpy())
+                    continue
+
+                latencies.append(elapsed * 1000)
+                generated_tokens += len(new_tokens)
+
+    np.savez(outputs_path, logprobs=np.stack(last_logits), tokens=np.array(greedy_tokens, dtype=object))
+    total_seconds = sum(latencies) / 1000
+
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "latency_ms_p50": round(percentile(latencies, 50), 1),
+        "latency_ms_p95": round(percentile(latencies, 95), 1),
+        "tokens_per_second": round(generated_tokens / total_seconds, 1) if total_seconds else 0.0,
+        "rss_mb": round(current_rss_mb(), 1),
+        "model_rss_mb": round(current_rss_mb() - rss_before, 1)
+    }
+
+
+def embedding_parity(reference_path, candidate_path):
+    reference = np.load(reference_path)
+    candidate = np.load(candidate_path)
+    cosines = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "passed": bool(cosines.min() >= MIN_EMBEDDING_COSINE)
+    }
+
+
+def llm_parity(reference_path, candidate_path):
+    reference = np.load(reference_path, allow_pickle=True)
+    candidate = np.load(candidate_path, allow_pickle=True)
+
+    agreements = []
+    for ref_tokens, cand_tokens in zip(reference["tokens"], candidate["tokens"]):
+        length = max(len(ref_tokens), 1)
+        agreements.append(sum(a == b for a, b in zip(ref_tokens, cand_tokens)) / length)
+
+    top1 = np.mean(reference["logprobs"].argmax(axis=1) == candidate["logprobs"].argmax(axis=1))
+    max_diff = np.abs(reference["logprobs"] - candidate["logprobs"]).max()
+    agreement = float(np.mean(agreements))
+    return {
+        "greedy_token_agreement": round(agreement, 4),
+        "next_token_top1_agreement": round(float(top1), 4),
+        "max_abs_logprob_diff": round(float(max_diff), 4),
+        "passed": bool(agreement >= MIN_TOKEN_AGREEMENT)
+    }
+
+
+def run_backend(component, backend, args, outputs_path):
+    """Executa o benchmark de um backend em um subprocesso isolado"""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--component", component, "--backends", backend,
+        "--runs", str(args.runs), "--batch-size", str(args.batch_size),
+        "--max-new-tokens", str(args.max_new_tokens), "--outputs", outputs_path
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "falha"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridade e benchmark dos backends de inferência")
+    parser.add_argument("--component", choices=["embedding", "llm", "all"], default="all")
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "quantized", "onnx"])
+    parser.add_argument("--runs", type=int, default=3, help="Repetições de cada medição")
+    parser.add_argument("--batch-size", type=int, default=32, help="Tamanho do lote na medição de vazão dos embeddings")
+    parser.add_argument("--max-new-tokens", type=int, default=32, help="Tokens gerados por prompt no benchmark do LLM")
+    parser.add_argument("--output", default=None, help="Arquivo JSON com os resultados")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--outputs", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        backend = args.backends[0]
+        if args.component == "embedding":
+            result = run_embedding_worker(backend, args.runs, args.batch_size, args.outputs)
+        else:
+            result = run_llm_worker(backend, args.runs, args.max_new_tokens, args.outputs)
+        print(json.dumps(result))
+        return
+
+    components = ["embedding", "llm"] if args.component == "all" else [args.component]
+    backends = ["pytorch"] + [backend for backend in args.backends if backend != "pytorch"]
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": {}}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for component in components:
+            report["results"][component] = {}
+            parity = embedding_parity if component == "embedding" else llm_parity
+            suffix = ".npy" if component == "embedding" else ".npz"
+            reference_path = os.path.join(tmp_dir, f"{component}_pytorch{suffix}")
+
+            for backend in backends:
+                outputs_path = os.path.join(tmp_dir, f"{component}_{backend}{suffix}")
+                print(f"⏱️  {component} / {backend}...")
+                result = run_backend(component, backend, args, outputs_path)
+                if "error" not in result and backend != "pytorch" and os.path.exists(reference_path):
+                    result["parity"] = parity(reference_path, outputs_path)
+                report["results"][component][backend] = result
+                print(f"   {json.dumps(result, ensure_ascii=False)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
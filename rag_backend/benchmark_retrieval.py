@@ -0,0 +1,359 @@
+"""
+Benchmark de custo e qualidade da busca do ChromaVectorStore
+
+Monta um corpus (sintético ou a partir de um fixture rotulado, completado com
+chunks sintéticos até o tamanho pedido) pelo caminho normal de indexação
+(index_many), repete um conjunto de queries nos modos semantic, lexical e
+hybrid e em search_specific, e grava em JSON latências p50/p95/p99, QPS,
+memória e recall@k/MRR contra as respostas rotuladas.
+
+O cache persistente de embeddings fica desligado por padrão: ele mora em
+--db-path, então com --reuse as queries repetidas mediriam acertos de cache
+e não a codificação. O estado do cache vai para o JSON de saída.
+
+Formato do fixture:
+    {
+      "documents": [{"id": "...", "article_name": "...", "content": "...", "url": "..."}],
+      "queries": [{"query": "...", "relevant_articles": ["..."],
+                   "article": "nome para search_specific (opcional)",
+                   "answer": "trecho esperado no resultado específico (opcional)"}]
+    }
+
+Uso:
+    cd rag_backend
+    python benchmark_retrieval.py --size 10000 --queries 200 --output retrieval_benchmark.json
+    python benchmark_retrieval.py --fixture fixture.json --size 100000 --db-path ./bench_db --reuse
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models.hits import format_hits
+
+INDEX_NAME = "full_document_index"
+SEARCH_TYPES = ("semantic", "lexical", "hybrid")
+
+# Vocabulário comum a todos os chunks sintéticos (ruído compartilhado entre artigos)
+GENERAL_WORDS = (
+    "estudo análise resultados método pesquisa dados modelo sistema processo avaliação "
+    "aplicação desenvolvimento abordagem proposta experimento contexto estrutura desempenho "
+    "ensino aprendizagem tecnologia informação conhecimento rede algoritmo amostra variável "
+    "hipótese teoria prática impacto qualidade eficiência estratégia ferramenta projeto"
+).split()
+
+SYLLABLES = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ru", "sa", "te", "vi", "xo", "za",
+             "bra", "cre", "tri", "plo", "gna", "lha", "nhe", "qua", "ros", "tum"]
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def latency_summary(latencies_ms):
+    values = np.asarray(latencies_ms)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(values.mean()), 2)
+    }
+
+
+class SyntheticCorpus:
+    """
+    Corpus sintético determinístico com queries rotuladas
+
+    Cada artigo tem palavras de tópico próprias e cada chunk algumas palavras
+    exclusivas; as queries combinam palavras de tópico e exclusivas de um
+    chunk, então o artigo (e o chunk) corretos são conhecidos.
+    """
+
+    def __init__(self, num_chunks, num_queries, chunks_per_article=10, seed=13):
+        self.num_chunks = num_chunks
+        self.chunks_per_article = chunks_per_article
+        self.rng = random.Random(seed)
+        self.query_stride = max(1, num_chunks // num_queries) if num_queries else 0
+        self.queries = []
+
+    def _word(self):
+        return "".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4)))
+
+    def documents(self):
+        """Gera tuplas (id, body) no formato de index_many"""
+        produced = 0
+        article = 0
+        while produced < self.num_chunks:
+            topic_words = [self._word() for _ in range(8)]
+            article_name = f"{' '.join(topic_words[:3]).title()} {article}"
+            for chunk_index in range(min(self.chunks_per_article, self.num_chunks - produced)):
+                unique_words = [self._word() for _ in range(3)]
+                words = (
+                    self.rng.sample(topic_words, 4) + unique_words +
+                    self.rng.sample(GENERAL_WORDS, 30)
+                )
+                self.rng.shuffle(words)
+                content = " ".join(words)
+
+                if self.query_stride and produced % self.query_stride == 0:
+                    self.queries.append({
+                        "query": " ".join(self.rng.sample(topic_words[:4], 2) + unique_words[:2]),
+                        "relevant_articles": [article_name],
+                        "article": article_name.lower(),
+                        "answer": content
+                    })
+
+                yield f"bench_{article}_{chunk_index}", {
+                    "article_name": article_name,
+                    "content": content,
+                    "article_fulldoc_url": f"https://exemplo.com/bench/{article}",
+                    "article_id": f"bench_{article}",
+                    "chunk_index": chunk_index
+                }
+                produced += 1
+            article += 1
+
+
+def load_fixture(path):
+    with open(path, "r", encoding="utf-8") as f:
+        fixture = json.load(f)
+    documents = [
+        (document.get("id", f"fixture_{i}"), {
+            "article_name": document["article_name"],
+            "content": document["content"],
+            "article_fulldoc_url": document.get("url", ""),
+            "article_id": document.get("id", f"fixture_{i}")
+        })
+        for i, document in enumerate(fixture["documents"])
+    ]
+    return documents, fixture["queries"]
+
+
+def build_corpus(store, args):
+    """Indexa o corpus pelo caminho normal e retorna (queries, estatísticas)"""
+    fixture_docs, fixture_queries = load_fixture(args.fixture) if args.fixture else ([], [])
+    synthetic = SyntheticCorpus(
+        max(args.size - len(fixture_docs), 0),
+        0 if args.fixture else args.queries,
+        chunks_per_article=args.chunks_per_article,
+        seed=args.seed
+    )
+
+    count = store.get_collection_stats(INDEX_NAME)
+    if args.reuse and count >= args.size:
+        # Regenera apenas as queries do corpus sintético, sem reindexar
+        for _ in synthetic.documents():
+            pass
+        return fixture_queries or synthetic.queries, {"reused": True, "chunks": count}
+
+    def items():
+        yield from fixture_docs
+        yield from synthetic.documents()
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    indexed = store.index_many(INDEX_NAME, items(), batch_size=args.batch_size)
+    seconds = time.perf_counter() - start
+
+    return fixture_queries or synthetic.queries, {
+        "reused": False,
+        "chunks": indexed,
+        "index_seconds": round(seconds, 2),
+        "chunks_per_second": round(indexed / seconds, 1) if seconds else 0.0,
+        "index_rss_growth_mb": round(current_rss_mb() - rss_before, 1)
+    }
+
+
+def reciprocal_rank(ranked_articles, relevant):
+    for rank, article in enumerate(ranked_articles, start=1):
+        if article in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def replay(function, queries, concurrency):
+    """Executa function(query) para cada query e retorna (resultados, latências, segundos)"""
+    def timed(query):
+        start = time.perf_counter()
+        result = function(query)
+        return result, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(timed, queries))
+    else:
+        outcomes = [timed(query) for query in queries]
+    seconds = time.perf_counter() - start
+    return [result for result, _ in outcomes], [latency for _, latency in outcomes], seconds
+
+
+def evaluate_search(store, queries, search_type, args):
+    def run(query):
+        return format_hits(store.search(INDEX_NAME, query["query"], k=args.k, search_type=search_type))
+
+    for query in queries[:args.warmup]:
+        run(query)
+    if not args.warm_query_cache:
+        store.query_cache.clear()
+
+    results, latencies, seconds = replay(run, queries, args.concurrency)
+    recalls, reciprocal_ranks = [], []
+    for query, result in zip(queries, results):
+        ranked = list(result)[:args.k]
+        relevant = set(query["relevant_articles"])
+        recalls.append(len(relevant.intersection(ranked)) / len(relevant))
+        reciprocal_ranks.append(reciprocal_rank(ranked, relevant))
+
+    return {
+        "queries": len(queries),
+        "latency_ms": latency_summary(latencies),
+        "qps": round(len(queries) / seconds, 1),
+        f"recall_at_{args.k}": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4)
+    }
+
+
+def evaluate_specific(store, queries, args):
+    queries = [query for query in queries if query.get("article")]
+    if not queries:
+        return None
+
+    def run(query):
+        return format_hits(store.search_specific(INDEX_NAME, query["query"], filename=query["article"], k=args.k))
+
+    if not args.warm_query_cache:
+        store.query_cache.clear()
+    results, latencies, seconds = replay(run, queries, args.concurrency)
+
+    article_hits, answer_hits = [], []
+    for query, result in zip(queries, results):
+        article_hits.append(bool(set(query["relevant_articles"]).intersection(result)))
+        if query.get("answer"):
+            answer_hits.append(any(query["answer"] in text for text in result.values()))
+
+    return {
+        "queries": len(queries),
+        "latency_ms": latency_summary(latencies),
+        "qps": round(len(queries) / seconds, 1),
+        "article_resolved": round(float(np.mean(article_hits)), 4),
+        f"answer_recall_at_{args.k}": round(float(np.mean(answer_hits)), 4) if answer_hits else None
+    }
+
+
+def embedding_cache_state(store):
+    """Se o cache de embeddings estava ligado e, nesse caso, seus acertos e faltas"""
+    cache = store.encoder.cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "path": cache.path, **cache.stats()}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latência e relevância da busca")
+    parser.add_argument("--size", type=int, default=10_000, help="Número de chunks do corpus")
+    parser.add_argument("--queries", type=int, default=200, help="Queries sintéticas rotuladas")
+    parser.add_argument("--fixture", default=None, help="JSON com documentos e queries rotuladas")
+    parser.add_argument("--chunks-per-article", type=int, default=10)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256, help="Tamanho do lote de indexação")
+    parser.add_argument("--concurrency", type=int, default=1, help="Queries simultâneas no replay")
+    parser.add_argument("--warmup", type=int, default=5, help="Queries de aquecimento (não medidas)")
+    parser.add_argument("--warm-query-cache", action="store_true", help="Não limpa o cache de queries entre os modos")
+    parser.add_argument("--search-types", nargs="+", default=list(SEARCH_TYPES), choices=SEARCH_TYPES)
+    parser.add_argument("--db-path", default=None, help="Diretório do ChromaDB (padrão: temporário, apagado no fim)")
+    parser.add_argument("--reuse", action="store_true", help="Reaproveita um corpus já indexado em --db-path")
+    parser.add_argument("--embedding-cache", action="store_true",
+                        help="Mantém o cache persistente de embeddings (desligado por padrão)")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", default=None, help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    db_path = args.db_path or tempfile.mkdtemp(prefix="bench_chroma_")
+    # O caminho precisa estar no ambiente antes de importar o vector store
+    os.environ["CHROMA_DB_PATH"] = db_path
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "1" if args.embedding_cache else "0"
+    if args.embedding_cache:
+        print("⚠️  Cache de embeddings ligado: as latências incluem acertos de cache")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from models.chroma_vector_store import ChromaVectorStore
+
+    try:
+        start = time.perf_counter()
+        store = ChromaVectorStore()
+        store.load_model()
+        startup_seconds = time.perf_counter() - start
+
+        print(f"📚 Indexando {args.size} chunks em {db_path}...")
+        queries, corpus = build_corpus(store, args)
+        corpus.update({"source": "fixture" if args.fixture else "synthetic", "startup_seconds": round(startup_seconds, 2)})
+        print(f"   {json.dumps(corpus, ensure_ascii=False)}")
+
+        results = {}
+        for search_type in args.search_types:
+            print(f"⏱️  {search_type}...")
+            results[search_type] = evaluate_search(store, queries, search_type, args)
+            print(f"   {json.dumps(results[search_type], ensure_ascii=False)}")
+
+        print("⏱️  specific...")
+        results["specific"] = evaluate_specific(store, queries, args)
+        print(f"   {json.dumps(results['specific'], ensure_ascii=False)}")
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "config": {
+                "args": {key: value for key, value in vars(args).items() if key != "output"},
+                "collections": store.hnsw_config(INDEX_NAME),
+                "env": {
+                    key: value for key, value in sorted(os.environ.items())
+                    if key.startswith(("EMBEDDING_", "SEARCH_", "QUERY_CACHE", "INFERENCE_", "HNSW_", "RRF_", "SHARD_", "FULL_INDEX_SHARDS"))
+                }
+            },
+            "corpus": corpus,
+            "embedding_cache": embedding_cache_state(store),
+            "memory_mb": {"rss": round(current_rss_mb(), 1), "peak_rss": round(peak_rss_mb(), 1)},
+            "results": results
+        }
+    finally:
+        if not args.db_path:
+            shutil.rmtree(db_path, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
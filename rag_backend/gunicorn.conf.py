@@ -0,0 +1,64 @@
+"""
+Configuração do gunicorn para produção
+
+Os modelos (DialoGPT e o SentenceTransformer) são carregados uma única vez no
+processo master (preload_app) e compartilhados com os workers por
+copy-on-write: os pesos ficam em buffers que os workers só leem, então não
+há uma cópia do modelo por worker. Cada worker reabre apenas o cliente do
+ChromaDB e os caches SQLite.
+
+Uso:
+    cd rag_backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import gc
+import multiprocessing
+import os
+
+# Os modelos precisam estar carregados antes do fork para serem compartilhados
+os.environ.setdefault("MODEL_WARMUP", "sync")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Processos (paralelismo de CPU) e threads por processo (conexões simultâneas)
+workers = int(os.getenv("GUNICORN_WORKERS", str(min(multiprocessing.cpu_count(), 4))))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# A geração pode levar dezenas de segundos em CPU
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers não recarrega os modelos: o novo worker é outro fork do master
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+preload_app = True
+accesslog = "-"
+
+# Threads do PyTorch por worker (0 = núcleos divididos igualmente entre os workers)
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))
+
+
+def pre_fork(server, worker):
+    # Move os objetos criados no preload para a geração permanente do GC, que
+    # não os percorre mais; assim as coletas nos workers não escrevem nessas
+    # páginas e elas continuam compartilhadas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+    from app import reopen_connections
+
+    torch.set_num_threads(TORCH_THREADS_PER_WORKER or max(1, multiprocessing.cpu_count() // server.cfg.workers))
+    reopen_connections()
+
+
+def child_exit(server, worker):
+    # Remove os arquivos de métricas do worker encerrado (modo multiprocesso do Prometheus)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
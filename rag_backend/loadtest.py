@@ -0,0 +1,240 @@
+"""
+Teste de carga da API (/rag, /search, /stats)
+
+Dois modos:
+  - fechado (padrão): --concurrency clientes enviando requisições em sequência
+  - aberto: --rate requisições/s com chegadas de Poisson, atendidas por até
+    --concurrency requisições simultâneas. A latência é medida a partir do
+    instante programado de envio, então a fila do lado do cliente também conta.
+
+Para medir só a busca e o servidor, sem o tempo do modelo, suba o backend com
+o LLM simulado e sem os caches de resposta/busca/embedding (com eles, depois do
+aquecimento o teste mede acertos de cache e não a recuperação):
+    LLM_CLIENT=stub STUB_LLM_LATENCY_MS=200 SEMANTIC_CACHE_ENABLED=0 ANSWER_CACHE_ENABLED=0 \
+        QUERY_CACHE_SIZE=0 EMBEDDING_CACHE_ENABLED=0 python app.py
+
+As queries vêm de loadtest_queries.txt (500 queries distintas) ou de --queries.
+
+Uso:
+    cd rag_backend
+    python loadtest.py --url http://127.0.0.1:5000 --mix rag=1,search=4,stats=1 --concurrency 16 --duration 60
+    python loadtest.py --rate 20 --concurrency 64 --duration 120 --output loadtest.json
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+# Queries variadas o bastante para não virarem acertos de cache depois do aquecimento
+DEFAULT_QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest_queries.txt")
+
+# Limites superiores (ms) dos intervalos do histograma de latência
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+def build_request(endpoint, query, search_type):
+    if endpoint == "rag":
+        return "POST", "/rag", {"query": query, "search_type": search_type}
+    if endpoint == "search":
+        return "POST", "/search", {"query": query, "search_type": search_type, "k": 5}
+    return "GET", "/stats", None
+
+
+def load_queries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def warn_enabled_caches(base_url, timeout):
+    """Avisa quando o servidor tem caches ligados que fariam o teste medir acertos de cache"""
+    try:
+        stats = requests.get(base_url.rstrip("/") + "/stats", timeout=timeout).json()
+    except (requests.RequestException, ValueError):
+        return
+    enabled = [name for name in ("semantic_cache", "answer_cache") if (stats.get(name) or {}).get("enabled")]
+    if enabled:
+        print(
+            f"⚠️ Caches ligados no servidor: {', '.join(enabled)}. Queries repetidas medem acertos de "
+            f"cache; para medir a recuperação e a geração, suba com SEMANTIC_CACHE_ENABLED=0 ANSWER_CACHE_ENABLED=0"
+        )
+
+
+def parse_mix(mix):
+    """Converte "rag=1,search=4" em listas paralelas de endpoints e pesos"""
+    endpoints, weights = [], []
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("rag", "search", "stats"):
+            raise ValueError(f"Endpoint desconhecido no mix: {name}")
+        endpoints.append(name)
+        weights.append(float(weight or 1))
+    return endpoints, weights
+
+
+class LoadTest:
+    def __init__(self, base_url, endpoints, weights, queries, search_type, timeout, seed):
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = endpoints
+        self.weights = weights
+        self.queries = queries
+        self.search_type = search_type
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        # Uma sessão (conexões keep-alive) por thread cliente
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def next_request(self):
+        with self._lock:
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            query = self.rng.choice(self.queries)
+        return endpoint, query
+
+    def send(self, endpoint, query, scheduled_at=None):
+        method, path, body = build_request(endpoint, query, self.search_type)
+        start = scheduled_at if scheduled_at is not None else time.perf_counter()
+        try:
+            response = self._session().request(method, self.base_url + path, json=body, timeout=self.timeout)
+            status = str(response.status_code)
+        except requests.Timeout:
+            status = "timeout"
+        except requests.RequestException:
+            status = "connection_error"
+        latency = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            self.statuses[endpoint][status] += 1
+
+    def run_closed(self, concurrency, duration, total_requests):
+        deadline = time.perf_counter() + duration
+        remaining = [total_requests]
+
+        def client():
+            while time.perf_counter() < deadline:
+                with self._lock:
+                    if total_requests and remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                self.send(*self.next_request())
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open(self, rate, concurrency, duration, total_requests):
+        start = time.perf_counter()
+        next_at = start
+        sent = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while next_at - start < duration and (not total_requests or sent < total_requests):
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, *self.next_request(), scheduled_at=next_at)
+                sent += 1
+                next_at += self.rng.expovariate(rate)
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            values = np.asarray(latencies)
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+            counts, _ = np.histogram(values, bins=[0] + HISTOGRAM_BUCKETS_MS + [np.inf])
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "error_rate": round(errors / len(latencies), 4),
+                "statuses": dict(statuses),
+                "latency_ms": {
+                    "p50": round(float(np.percentile(values, 50)), 1),
+                    "p90": round(float(np.percentile(values, 90)), 1),
+                    "p95": round(float(np.percentile(values, 95)), 1),
+                    "p99": round(float(np.percentile(values, 99)), 1),
+                    "max": round(float(values.max()), 1)
+                },
+                "histogram_ms": {
+                    f"<={bucket}" if bucket != np.inf else f">{HISTOGRAM_BUCKETS_MS[-1]}": int(count)
+                    for bucket, count in zip(HISTOGRAM_BUCKETS_MS + [np.inf], counts)
+                }
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints
+        }
+
+
+def print_report(report):
+    print(f"\n{report['requests']} requisições em {report['elapsed_seconds']}s ({report['throughput_rps']} req/s)")
+    for endpoint, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"  {endpoint:<7} n={stats['requests']:<6} erros={stats['error_rate']:.2%} "
+            f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms max={latency['max']}ms"
+        )
+        peak = max(stats["histogram_ms"].values()) or 1
+        for bucket, count in stats["histogram_ms"].items():
+            if count:
+                print(f"          {bucket:>8} ms {'#' * max(1, int(40 * count / peak))} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API do Academ.ia")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--mix", default="rag=1,search=4,stats=1", help="Pesos dos endpoints")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes (fechado) ou requisições simultâneas (aberto)")
+    parser.add_argument("--rate", type=float, default=None, help="Chegadas por segundo (modo aberto)")
+    parser.add_argument("--duration", type=float, default=30, help="Duração em segundos")
+    parser.add_argument("--requests", type=int, default=0, help="Limite de requisições (0 = só a duração)")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH, help="Arquivo com uma query por linha")
+    parser.add_argument("--search-type", default="hybrid", choices=["semantic", "lexical", "hybrid"])
+    parser.add_argument("--timeout", type=float, default=120, help="Timeout por requisição em segundos")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+
+    endpoints, weights = parse_mix(args.mix)
+    if "rag" in endpoints or "search" in endpoints:
+        warn_enabled_caches(args.url, args.timeout)
+    test = LoadTest(args.url, endpoints, weights, queries, args.search_type, args.timeout, args.seed)
+
+    mode = f"aberto, {args.rate} req/s" if args.rate else "fechado"
+    print(f"🚦 {args.url} | mix {args.mix} | concorrência {args.concurrency} | modo {mode} | {args.duration}s | {len(queries)} queries")
+    start = time.perf_counter()
+    if args.rate:
+        test.run_open(args.rate, args.concurrency, args.duration, args.requests)
+    else:
+        test.run_closed(args.concurrency, args.duration, args.requests)
+    report = test.report(time.perf_counter() - start)
+    report["config"] = vars(args)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .embedding_cache import normalize_text
+from .lru_cache import LRUCache
+
+
+def normalize_query(query):
+    """Normaliza a pergunta para a chave do cache (espaços e caixa)"""
+    return normalize_text(query).casefold()
+
+
+def fingerprint_documents(retrieved_docs):
+    """Hash do conjunto de documentos recuperados (muda quando o índice muda)"""
+    payload = json.dumps(retrieved_docs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Cache das respostas geradas pelo /rag
+
+    Um LRU em memória na frente de uma camada opcional em SQLite, que
+    sobrevive a reinícios e é compartilhada entre os workers. A chave combina
+    a pergunta normalizada, o search_type e o hash dos documentos
+    recuperados, então uma resposta deixa de ser usada assim que a busca
+    passa a retornar documentos diferentes.
+
+    Args:
+        maxsize: Número máximo de respostas em memória
+        ttl: Tempo de vida das respostas em segundos (None = sem expiração)
+        disk_path: Arquivo SQLite da camada em disco (None = apenas memória)
+        disk_max_entries: Número máximo de respostas em disco
+    """
+
+    def __init__(self, maxsize=512, ttl=3600, disk_path=None, disk_max_entries=10_000):
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inherited_conns = []
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._connect()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers(last_access)")
+        self._conn.commit()
+
+    def reopen(self):
+        """Abre uma nova conexão no processo atual (conexões SQLite não podem cruzar um fork)"""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._inherited_conns.append(self._conn)
+            self._connect()
+
+    @staticmethod
+    def make_key(query, search_type, retrieved_docs):
+        raw = f"{normalize_query(query)}\x00{search_type}\x00{fingerprint_documents(retrieved_docs)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Retorna a resposta em cache ou None"""
+        answer = self.memory.get(key)
+        if answer is not None or self._conn is None:
+            return answer
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and row[1] + self.ttl <= now):
+                self.disk_misses += 1
+                return None
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.disk_hits += 1
+
+        self.memory.put(key, row[0])
+        return row[0]
+
+    def put(self, key, answer):
+        self.memory.put(key, answer)
+        if self._conn is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Remove as respostas expiradas e, acima do limite, as menos usadas"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM answers WHERE created_at <= ?", (now - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count > self.disk_max_entries:
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY last_access ASC LIMIT ?)",
+                (count - int(self.disk_max_entries * 0.9),)
+            )
+
+    def clear(self):
+        self.memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM answers")
+                self._conn.commit()
+
+    def stats(self):
+        stats = {"memory": self.memory.stats(), "disk": None}
+        if self._conn is not None:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            stats["disk"] = {
+                "path": self.disk_path,
+                "entries": entries,
+                "max_entries": self.disk_max_entries,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses
+            }
+        return stats
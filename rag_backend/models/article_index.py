@@ -0,0 +1,233 @@
+import bisect
+import difflib
+import heapq
+import json
+import re
+from collections import Counter
+
+from .bm25_index import strip_accents
+from .delta_log import LoggedIndex
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+# Nomes com mais trigramas em comum com a query que passam para o difflib
+FUZZY_CANDIDATES = 50
+
+# A correspondência aproximada só aceita um único nome com similaridade acima
+# do limiar e à frente do segundo colocado por esta margem
+FUZZY_MARGIN = 0.05
+
+
+def fold_name(name):
+    """Normaliza um nome de artigo: sem acentos, minúsculo e só letras e números"""
+    return _NON_ALNUM_RE.sub(" ", strip_accents(name).lower()).strip()
+
+
+def trigrams(text):
+    """Trigramas distintos de um texto já normalizado"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ArticleNameIndex(LoggedIndex):
+    """
+    Índice dos nomes de artigos normalizados (sem acentos e caixa)
+
+    Resolve o nome informado pelo usuário para os nomes exatos gravados nos
+    metadados, por correspondência exata, prefixo, substring/termos e, por
+    fim, aproximada (difflib, só para erros de digitação com um único nome
+    claramente mais parecido). Os nomes resolvidos viram um filtro `where`
+    na consulta vetorial.
+
+    Nenhuma estratégia percorre todos os nomes: a exata é um dicionário, a de
+    prefixo uma busca binária nas chaves ordenadas, e substring/termos
+    intersectam listas invertidas de trigramas e de termos, começando pela
+    menor. A aproximada só compara com o difflib os FUZZY_CANDIDATES nomes
+    com mais trigramas em comum com a query, contados nas postings dos
+    trigramas mais raros dela.
+    """
+
+    snapshot_binary = False
+
+    def __init__(self, path=None, reload_interval=5.0):
+        super().__init__(path, reload_interval)
+        self.names = {}          # nome normalizado -> conjunto de nomes originais
+        self._sorted_keys = []
+        self._trigrams = {}      # trigrama -> nomes normalizados que o contêm
+        self._terms = {}         # termo -> nomes normalizados que o contêm
+        self._load()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, names):
+        with self._lock:
+            new = [name for name in names if fold_name(name) and name not in self.names.get(fold_name(name), ())]
+            if new:
+                self._record(("add", new))
+
+    def remove(self, names):
+        """Remove nomes de artigos (os que não têm mais documentos)"""
+        with self._lock:
+            removed = [name for name in names if name in self.names.get(fold_name(name), ())]
+            if removed:
+                self._record(("remove", removed))
+
+    def clear(self):
+        with self._lock:
+            self._record(("clear",))
+
+    def _apply(self, record):
+        """Aplica um registro do log ao estado em memória"""
+        if record[0] == "add":
+            for name in record[1]:
+                key = fold_name(name)
+                if not key:
+                    continue
+                if key not in self.names:
+                    self.names[key] = set()
+                    bisect.insort(self._sorted_keys, key)
+                    self._index_key(key)
+                self.names[key].add(name)
+        elif record[0] == "remove":
+            for name in record[1]:
+                key = fold_name(name)
+                originals = self.names.get(key)
+                if originals is None:
+                    continue
+                originals.discard(name)
+                if not originals:
+                    del self.names[key]
+                    del self._sorted_keys[bisect.bisect_left(self._sorted_keys, key)]
+                    self._unindex_key(key)
+        elif record[0] == "clear":
+            self.names = {}
+            self._sorted_keys = []
+            self._trigrams = {}
+            self._terms = {}
+
+    def _index_key(self, key):
+        for gram in trigrams(f" {key} "):
+            self._trigrams.setdefault(gram, set()).add(key)
+        for term in set(key.split()):
+            self._terms.setdefault(term, set()).add(key)
+
+    def _unindex_key(self, key):
+        for postings, tokens in ((self._trigrams, trigrams(f" {key} ")), (self._terms, set(key.split()))):
+            for token in tokens:
+                keys = postings.get(token)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del postings[token]
+
+    @staticmethod
+    def _intersect(postings, tokens):
+        """Chaves presentes nas postings de todos os tokens, da menor lista para a maior"""
+        lists = sorted((postings.get(token, ()) for token in tokens), key=len)
+        if not lists or not lists[0]:
+            return set()
+        result = set(lists[0])
+        for keys in lists[1:]:
+            result &= keys
+            if not result:
+                break
+        return result
+
+    def resolve(self, name, limit=5, cutoff=0.85):
+        """
+        Retorna os nomes originais dos artigos que correspondem a `name`
+
+        A primeira estratégia que encontrar algo vence: exata, prefixo,
+        substring ou todos os termos presentes, aproximada (só um nome,
+        sem ambiguidade). Sem correspondência, retorna [].
+        """
+        self._maybe_reload()
+        query = fold_name(name)
+        if not query:
+            return []
+
+        with self._lock:
+            if query in self.names:
+                return sorted(self.names[query])
+
+            start = bisect.bisect_left(self._sorted_keys, query)
+            keys = []
+            for key in self._sorted_keys[start:]:
+                if not key.startswith(query) or len(keys) >= limit:
+                    break
+                keys.append(key)
+
+            if not keys:
+                matches = set()
+                if len(query) >= 3:
+                    matches = {key for key in self._intersect(self._trigrams, trigrams(query)) if query in key}
+                matches |= self._intersect(self._terms, set(query.split()))
+                keys = sorted(matches)[:limit]
+
+            if not keys:
+                keys = self._fuzzy_match(query, cutoff)
+
+            return sorted(name for key in keys for name in self.names[key])
+
+    def _fuzzy_match(self, query, cutoff):
+        """
+        Corrige erros de digitação: o nome mais parecido, se não houver dúvida
+
+        Números do nome precisam bater exatamente ("Parte 1" não é "Parte 2"),
+        e um empate (ou quase) entre os melhores nomes não resolve para nenhum:
+        um artigo removido ou inexistente não deve virar outro artigo.
+        """
+        numbers = [term for term in query.split() if term.isdigit()]
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = []
+        for key in self._fuzzy_candidates(query):
+            if [term for term in key.split() if term.isdigit()] != numbers:
+                continue
+            matcher.set_seq1(key)
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                ratio = matcher.ratio()
+                if ratio >= cutoff:
+                    scored.append((ratio, key))
+        if not scored:
+            return []
+        scored.sort(reverse=True)
+        if len(scored) > 1 and scored[0][0] - scored[1][0] < FUZZY_MARGIN:
+            return []
+        return [scored[0][1]]
+
+    def _fuzzy_candidates(self, query):
+        """
+        Nomes com mais trigramas em comum com a query
+
+        Só a metade mais rara dos trigramas da query é contada: um nome parecido
+        o bastante para o difflib compartilha a maioria deles, e os trigramas
+        comuns (" de", "cao") teriam postings do tamanho do índice.
+        """
+        grams = sorted(trigrams(f" {query} "), key=lambda gram: len(self._trigrams.get(gram, ())))
+        overlap = Counter()
+        for gram in grams[:max(len(grams) // 2, 1)]:
+            overlap.update(self._trigrams.get(gram, ()))
+        return [key for key, _ in heapq.nlargest(FUZZY_CANDIDATES, overlap.items(), key=lambda item: item[1])]
+
+    def _write_snapshot(self, f):
+        json.dump(sorted(name for originals in self.names.values() for name in originals), f, ensure_ascii=False)
+
+    def _read_snapshot(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            names = json.load(f)
+        fresh = ArticleNameIndex()
+        for name in names:
+            key = fold_name(name)
+            if key:
+                fresh.names.setdefault(key, set()).add(name)
+        fresh._sorted_keys = sorted(fresh.names)
+        for key in fresh._sorted_keys:
+            fresh._index_key(key)
+        return fresh
+
+    def _swap(self, fresh):
+        self.names = fresh.names
+        self._sorted_keys = fresh._sorted_keys
+        self._trigrams = fresh._trigrams
+        self._terms = fresh._terms
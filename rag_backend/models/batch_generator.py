@@ -0,0 +1,147 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class GenerationRequest:
+    """Prompt já tokenizado aguardando geração"""
+
+    __slots__ = ("input_ids", "max_new_tokens", "future")
+
+    def __init__(self, input_ids, max_new_tokens):
+        self.input_ids = list(input_ids)
+        self.max_new_tokens = max_new_tokens
+        self.future = Future()
+
+
+class BatchGenerator:
+    """
+    Worker de geração com batching dinâmico
+
+    Os prompts recebidos são acumulados por até max_wait_ms (ou até
+    max_batch_size), preenchidos à esquerda em um único tensor e gerados com
+    uma só chamada a model.generate. Cada chamador recebe o seu Future.
+    Toda chamada a model.generate (dos lotes, com batching desligado ou da
+    geração em streaming, via `generate`) passa pela mesma trava, então
+    requisições concorrentes do Flask não disputam o mesmo modelo PyTorch.
+
+    Args:
+        model: Modelo causal do transformers
+        tokenizer: Tokenizer correspondente
+        device: Dispositivo do modelo
+        max_batch_size: Máximo de prompts por chamada ao modelo
+        max_wait_ms: Tempo máximo de espera para completar um lote
+        enabled: Se False, cada prompt é gerado na thread do chamador
+        generate_kwargs: Parâmetros extras para model.generate
+    """
+
+    def __init__(self, model, tokenizer, device, max_batch_size=8, max_wait_ms=20,
+                 enabled=True, generate_kwargs=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.enabled = enabled
+        self.generate_kwargs = generate_kwargs or {}
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Uma chamada a model.generate por vez, de qualquer thread
+        self.model_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, input_ids, max_new_tokens=150):
+        """Enfileira um prompt tokenizado e retorna um Future com o texto gerado"""
+        request = GenerationRequest(input_ids, max_new_tokens)
+        if not self.enabled:
+            self._generate([request])
+            return request.future
+
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, **kwargs):
+        """Chama model.generate com exclusividade sobre o modelo (ex.: geração em streaming)"""
+        import torch
+
+        with self.model_lock, torch.no_grad():
+            return self.model.generate(**kwargs)
+
+    def _ensure_worker(self):
+        # Threads não sobrevivem a um fork (ex.: gunicorn com preload), então
+        # o worker é iniciado sob demanda em cada processo
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="llm-batch-generator", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._generate(batch)
+
+    def _generate(self, batch):
+        try:
+            # Modelos causais precisam de padding à esquerda para gerar em lote
+            self.tokenizer.padding_side = "left"
+            inputs = self.tokenizer.pad(
+                {"input_ids": [request.input_ids for request in batch]},
+                padding=True,
+                return_tensors="pt"
+            ).to(self.device)
+            max_new_tokens = max(request.max_new_tokens for request in batch)
+
+            outputs = self.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                max_new_tokens=max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+                **self.generate_kwargs
+            )
+
+            input_length = inputs["input_ids"].shape[1]
+            for request, output in zip(batch, outputs):
+                new_tokens = output[input_length:input_length + request.max_new_tokens].tolist()
+                if self.tokenizer.eos_token_id in new_tokens:
+                    new_tokens = new_tokens[:new_tokens.index(self.tokenizer.eos_token_id)]
+                # Quantidade de tokens gerados, lida pelo chamador para as métricas
+                request.future.generated_tokens = len(new_tokens)
+                request.future.set_result(self.tokenizer.decode(new_tokens, skip_special_tokens=True))
+
+            self.batches += 1
+            self.requests += len(batch)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "queue_depth": self._queue.qsize()
+        }
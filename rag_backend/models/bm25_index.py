@@ -0,0 +1,200 @@
+import heapq
+import math
+import pickle
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+from nltk.stem.snowball import SnowballStemmer
+
+from .delta_log import LoggedIndex
+
+# Stopwords do português (lista embutida para não depender de downloads do NLTK)
+PORTUGUESE_STOPWORDS = {
+    "a", "ao", "aos", "aquela", "aquelas", "aquele", "aqueles", "aquilo", "as", "até", "com", "como",
+    "da", "das", "de", "dela", "delas", "dele", "deles", "depois", "do", "dos", "e", "ela", "elas",
+    "ele", "eles", "em", "entre", "era", "eram", "essa", "essas", "esse", "esses", "esta", "está",
+    "estas", "este", "estes", "eu", "foi", "foram", "há", "isso", "isto", "já", "lhe", "lhes", "mais",
+    "mas", "me", "mesmo", "meu", "minha", "muito", "na", "nas", "nem", "no", "nos", "nós", "num",
+    "numa", "o", "os", "ou", "para", "pela", "pelas", "pelo", "pelos", "por", "qual", "quais",
+    "quando", "que", "quem", "se", "sem", "ser", "seu", "seus", "só", "sua", "suas", "são", "também",
+    "te", "tem", "têm", "ter", "um", "uma", "umas", "uns", "você", "vocês", "é", "onde", "sobre"
+}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_stemmer = SnowballStemmer("portuguese")
+
+
+def strip_accents(text):
+    """Remove acentos (NFKD sem os caracteres combinantes)"""
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=100_000)
+def _stem(word):
+    # O stemmer do português depende dos acentos; eles são removidos só depois
+    return strip_accents(_stemmer.stem(word))
+
+
+def tokenize(text):
+    """Tokeniza texto em português: minúsculas, sem stopwords, com stemming"""
+    return [
+        _stem(token)
+        for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in PORTUGUESE_STOPWORDS and not token.isdigit()
+    ]
+
+
+class BM25Index(LoggedIndex):
+    """
+    Índice invertido BM25 (Okapi) em memória, persistido em disco
+
+    As listas de postings (termo -> {documento: frequência}) são mantidas
+    prontas, então uma busca só percorre as postings dos termos da query.
+    O índice é atualizado incrementalmente a cada add/remove. Em disco, cada
+    `save` só acrescenta as mudanças ao log do DeltaLog (o snapshot completo
+    é regravado apenas na compactação), e os outros processos aplicam as
+    mudanças do log sem bloquear as buscas durante a leitura do arquivo.
+    """
+
+    def __init__(self, path=None, k1=1.5, b=0.75, reload_interval=5.0):
+        super().__init__(path, reload_interval)
+        self.k1 = k1
+        self.b = b
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.postings = {}
+        self.doc_ids = []        # posição -> ID do documento (None se removido)
+        self.doc_terms = []      # posição -> termos distintos (para remoção)
+        self.doc_len = []
+        self.id_to_pos = {}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.id_to_pos)
+
+    def add(self, ids, texts):
+        """Adiciona (ou substitui) documentos no índice"""
+        record = ("add", [(doc_id, dict(Counter(tokenize(text)))) for doc_id, text in zip(ids, texts)])
+        with self._lock:
+            self._record(record)
+
+    def clear(self):
+        """Remove todos os documentos do índice"""
+        with self._lock:
+            self._record(("clear",))
+
+    def remove(self, ids):
+        with self._lock:
+            self._record(("remove", list(ids)))
+
+    def _apply(self, record):
+        """Aplica um registro do log ao estado em memória"""
+        if record[0] == "add":
+            for doc_id, terms in record[1]:
+                if doc_id in self.id_to_pos:
+                    self._remove_one(doc_id)
+
+                pos = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self.doc_terms.append(tuple(terms))
+                length = sum(terms.values())
+                self.doc_len.append(length)
+                self.total_len += length
+                self.id_to_pos[doc_id] = pos
+
+                for term, tf in terms.items():
+                    self.postings.setdefault(term, {})[pos] = tf
+        elif record[0] == "remove":
+            for doc_id in record[1]:
+                if doc_id in self.id_to_pos:
+                    self._remove_one(doc_id)
+        elif record[0] == "clear":
+            self._reset()
+
+    def _remove_one(self, doc_id):
+        pos = self.id_to_pos.pop(doc_id)
+        for term in self.doc_terms[pos]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(pos, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_len -= self.doc_len[pos]
+        self.doc_ids[pos] = None
+        self.doc_terms[pos] = ()
+        self.doc_len[pos] = 0
+
+    def search(self, query, k=5):
+        """Retorna até k tuplas (id, score) ordenadas por score BM25"""
+        self._maybe_reload()
+        with self._lock:
+            n_docs = len(self.id_to_pos)
+            if not n_docs:
+                return []
+            avg_len = self.total_len / n_docs
+            scores = {}
+
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for pos, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_len[pos] / avg_len)
+                    scores[pos] = scores.get(pos, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self.doc_ids[pos], score) for pos, score in top]
+
+    def _compact(self):
+        """Renumera as posições, descartando as de documentos removidos"""
+        live = [(doc_id, terms, length) for doc_id, terms, length
+                in zip(self.doc_ids, self.doc_terms, self.doc_len) if doc_id is not None]
+        old_pos = {doc_id: pos for doc_id, pos in self.id_to_pos.items()}
+        postings = self.postings
+        self._reset()
+        for doc_id, terms, length in live:
+            pos = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.doc_terms.append(terms)
+            self.doc_len.append(length)
+            self.total_len += length
+            self.id_to_pos[doc_id] = pos
+            for term in terms:
+                self.postings.setdefault(term, {})[pos] = postings[term][old_pos[doc_id]]
+
+    def _write_snapshot(self, f):
+        if len(self.doc_ids) > 2 * max(len(self.id_to_pos), 1):
+            self._compact()
+        pickle.dump({
+            "postings": self.postings,
+            "doc_ids": self.doc_ids,
+            "doc_terms": self.doc_terms,
+            "doc_len": self.doc_len,
+            "total_len": self.total_len
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _read_snapshot(self, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        fresh = BM25Index(k1=self.k1, b=self.b)
+        fresh.postings = state["postings"]
+        fresh.doc_ids = state["doc_ids"]
+        fresh.doc_terms = state["doc_terms"]
+        fresh.doc_len = state["doc_len"]
+        fresh.total_len = state["total_len"]
+        fresh.id_to_pos = {doc_id: pos for pos, doc_id in enumerate(fresh.doc_ids) if doc_id is not None}
+        return fresh
+
+    def _swap(self, fresh):
+        self.postings = fresh.postings
+        self.doc_ids = fresh.doc_ids
+        self.doc_terms = fresh.doc_terms
+        self.doc_len = fresh.doc_len
+        self.id_to_pos = fresh.id_to_pos
+        self.total_len = fresh.total_len
@@ -1,9 +1,99 @@
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+import contextvars
+import heapq
+import itertools
 import json
-from collections import defaultdict
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 import os
+import threading
+import time
+from .embedding_cache import EmbeddingCache, CachedEncoder, normalize_text
+from .lru_cache import LRUCache
+from .bm25_index import BM25Index
+from .article_index import ArticleNameIndex
+from .collection_aliases import CollectionAliases
+from .shard_router import ShardRouter
+from .hits import Hit, hits_from_query
+from .reranker import CrossEncoderReranker, RERANK_ENABLED, RERANK_CANDIDATES
+from .inference_backend import EMBEDDING_BACKEND, load_sentence_transformer
+from .metrics import span, INDEXED_DOCUMENTS
+
+# Diretório de persistência do ChromaDB (os índices auxiliares ficam ao lado)
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+
+# Modelo de embeddings e cache persistente dos vetores
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CHROMA_DB_PATH, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+
+# Índices léxicos BM25, um arquivo por coleção
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", os.path.join(CHROMA_DB_PATH, "bm25"))
+
+# Índices de nomes de artigos usados na busca específica
+ARTICLE_INDEX_PATH = os.getenv("ARTICLE_INDEX_PATH", os.path.join(CHROMA_DB_PATH, "article_names"))
+
+# Constante da Reciprocal Rank Fusion usada na busca híbrida
+RRF_K = 60
+
+# Parâmetros HNSW aplicados ao criar uma coleção. Cada um pode ser definido para
+# todas (HNSW_M) ou para um índice (HNSW_FULL_DOCUMENT_INDEX_M). M e construction_ef
+# de uma coleção existente só mudam com rebuild_index.py; search_ef muda na hora
+HNSW_PARAMS = {"M": "HNSW_M", "construction_ef": "HNSW_CONSTRUCTION_EF", "search_ef": "HNSW_SEARCH_EF"}
+
+# Coleção física que atende cada índice (trocada ao fim de uma reconstrução)
+COLLECTION_ALIASES_PATH = os.getenv("COLLECTION_ALIASES_PATH", os.path.join(CHROMA_DB_PATH, "collection_aliases.json"))
+
+# Arquivo tocado a cada escrita nas coleções; caches derivados dos dados (como o
+# cache semântico de queries) se invalidam quando a data de modificação muda
+DATA_VERSION_PATH = os.getenv("DATA_VERSION_PATH", os.path.join(CHROMA_DB_PATH, "data_version"))
+
+# Espera para que os outros processos vejam uma mudança de alias antes do próximo passo
+HNSW_REBUILD_GRACE_SECONDS = float(os.getenv("HNSW_REBUILD_GRACE_SECONDS", "10"))
+
+INDEX_NAMES = ("summary_index", "full_document_index")
+
+# Particionamento do full_document_index em coleções (shards): cada uma tem seu
+# próprio índice HNSW e as buscas consultam todas em paralelo. SHARD_KEY "hash"
+# usa FULL_INDEX_SHARDS shards; "year" usa as faixas de publication_year que
+# começam em cada ano de SHARD_YEARS (ex.: "2010,2020" -> 3 shards)
+FULL_INDEX_SHARDS = int(os.getenv("FULL_INDEX_SHARDS", "1"))
+SHARD_KEY = os.getenv("SHARD_KEY", "hash")
+SHARD_YEARS = [int(year) for year in os.getenv("SHARD_YEARS", "").split(",") if year.strip()]
+
+# Shards só são abertos na primeira consulta ou escrita que os alcança; com
+# SHARD_KEY "year", buscas com faixa de anos não abrem os shards de fora dela
+SHARD_LAZY_OPEN = os.getenv("SHARD_LAZY_OPEN", "0") == "1"
+
+# Buscas léxicas com faixa de anos pedem mais candidatos ao BM25, que não conhece o ano
+YEAR_FILTER_OVERSAMPLE = int(os.getenv("YEAR_FILTER_OVERSAMPLE", "4"))
+
+# Sub-consultas (semântica/léxica, por índice) executadas em paralelo e prazo por busca
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "8"))
+SEARCH_TIMEOUT_MS = float(os.getenv("SEARCH_TIMEOUT_MS", "2000"))
+
+
+def hnsw_params(index_name):
+    """Parâmetros HNSW configurados para o índice (só os definidos no ambiente)"""
+    params = {}
+    for param, env_name in HNSW_PARAMS.items():
+        specific = env_name.replace("HNSW_", f"HNSW_{index_name.upper()}_", 1)
+        value = os.getenv(specific, os.getenv(env_name))
+        if value:
+            params[param] = int(value)
+    return params
+
+
+def collection_metadata(index_name, params=None):
+    """Metadados de criação da coleção: espaço cosseno e parâmetros HNSW"""
+    params = hnsw_params(index_name) if params is None else params
+    metadata = {"hnsw:space": "cosine"}
+    metadata.update({f"hnsw:{param}": value for param, value in params.items() if value is not None})
+    return metadata
+
 
 class ChromaVectorStore:
     _instance = None
@@ -11,59 +101,557 @@ class ChromaVectorStore:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(ChromaVectorStore, cls).__new__(cls)
-            cls._instance.model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Todas as codificações passam pelo cache persistente de embeddings. Vetores
+            # de backends diferentes do fp32 original não se misturam no cache. O modelo
+            # é carregado sob demanda, só quando um texto não está no cache
+            cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES) if EMBEDDING_CACHE_ENABLED else None
+            cache_model_name = EMBEDDING_MODEL_NAME if EMBEDDING_BACKEND == "pytorch" else f"{EMBEDDING_MODEL_NAME}@{EMBEDDING_BACKEND}"
+            cls._instance.encoder = CachedEncoder(
+                None, cache_model_name, cache,
+                loader=lambda: load_sentence_transformer(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND)
+            )
+            cls._instance.query_cache = LRUCache(maxsize=QUERY_CACHE_SIZE)
+            cls._instance.reranker = CrossEncoderReranker()
+            cls._instance._executor = None
+            cls._instance._executor_pid = None
+            cls._instance._executor_lock = threading.Lock()
+            cls._instance.aliases = CollectionAliases(COLLECTION_ALIASES_PATH)
+            cls._instance.router = ShardRouter("full_document_index", FULL_INDEX_SHARDS, SHARD_KEY, SHARD_YEARS)
+            cls._instance._shard_lock = threading.Lock()
             
             # Configurar ChromaDB para persistência local
-            cls._instance.client = chromadb.PersistentClient(
-                path="./chroma_db",
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            cls._instance._open_client()
+            cls._instance._warn_other_shard_layouts()
             
-            # Criar ou obter coleções
-            cls._instance.summary_collection = cls._instance.client.get_or_create_collection(
-                name="summary_index",
-                metadata={"hnsw:space": "cosine"}
-            )
-            cls._instance.full_collection = cls._instance.client.get_or_create_collection(
-                name="full_document_index", 
-                metadata={"hnsw:space": "cosine"}
-            )
+            # Índices léxicos BM25 mantidos ao lado das coleções
+            cls._instance.lexical_indexes = {
+                name: BM25Index(os.path.join(BM25_INDEX_PATH, f"{name}.pkl"))
+                for name in ("summary_index", "full_document_index")
+            }
+            
+            cls._instance.article_indexes = {
+                name: ArticleNameIndex(os.path.join(ARTICLE_INDEX_PATH, f"{name}.json"))
+                for name in ("summary_index", "full_document_index")
+            }
+            
+            # Coleções criadas antes dos índices auxiliares são indexadas uma única vez
+            for name in ("summary_index", "full_document_index"):
+                missing = not len(cls._instance.lexical_indexes[name]) or not len(cls._instance.article_indexes[name])
+                if missing and cls._instance._stored_count(name):
+                    cls._instance.rebuild_auxiliary_indexes(name)
             
         return cls._instance
 
+    @property
+    def model(self):
+        """Modelo de embeddings (carregado no primeiro acesso)"""
+        return self.encoder.model
+
+    def load_model(self):
+        """Carrega o modelo de embeddings antecipadamente (warmup)"""
+        return self.encoder.model
+
+    def _open_client(self):
+        """Abre o cliente persistente do ChromaDB e as coleções"""
+        self.client = chromadb.PersistentClient(
+            path=CHROMA_DB_PATH,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+        
+        # Criar ou obter as coleções apontadas pelos aliases (shards frios ficam para depois)
+        self.collections = {}
+        for index_name in INDEX_NAMES:
+            for shard_name in self.shard_names(index_name):
+                if shard_name == "summary_index" or not SHARD_LAZY_OPEN:
+                    self._open_collection(shard_name)
+
+    def _warn_other_shard_layouts(self):
+        """Avisa se há documentos em coleções de outra divisão em shards, que as buscas não consultam"""
+        sharded = len(self.router.names) > 1
+        for collection in self.client.list_collections():
+            match = re.fullmatch(r"full_document_index(?:_s(\d+))?(?:_v\d+)?", getattr(collection, "name", collection))
+            if match is None:
+                continue
+            shard = match.group(1)
+            if sharded:
+                stale = shard is None or int(shard) >= len(self.router.names)
+            else:
+                stale = shard is not None
+            if stale and self.client.get_collection(match.group(0)).count():
+                print(
+                    f"⚠️ A coleção {match.group(0)} é de outra divisão do full_document_index em shards e não "
+                    f"será consultada; reindexe os documentos após mudar FULL_INDEX_SHARDS/SHARD_KEY/SHARD_YEARS"
+                )
+
+    def _open_collection(self, shard_name):
+        """Abre a coleção física que atende o índice (ou shard) e avisa se os parâmetros HNSW divergem"""
+        index_name = "summary_index" if shard_name == "summary_index" else "full_document_index"
+        name = self.aliases.collection_name(shard_name)
+        collection = self.client.get_or_create_collection(
+            name=name,
+            metadata=collection_metadata(index_name)
+        )
+        self.collections[shard_name] = collection
+
+        divergent = {
+            param: value for param, value in hnsw_params(index_name).items()
+            if self._current_hnsw_params(collection).get(param) != value
+        }
+        # search_ef pode ser alterado em uma coleção existente; M e construction_ef não
+        if "search_ef" in divergent:
+            try:
+                self._set_search_ef(collection, divergent.pop("search_ef"))
+            except Exception as e:
+                print(f"Erro ao ajustar search_ef de {name}: {e}")
+        if divergent:
+            print(
+                f"⚠️ Coleção {name} criada com outros parâmetros HNSW; {divergent} só valem após "
+                f"`python rebuild_index.py --index {index_name}`"
+            )
+        return collection
+
+    def _current_hnsw_params(self, collection):
+        """Parâmetros HNSW em vigor na coleção (configuração ou, nas antigas, metadados)"""
+        config = (getattr(collection, "configuration_json", None) or {}).get("hnsw") or {}
+        if config:
+            return {
+                "M": config.get("max_neighbors"),
+                "construction_ef": config.get("ef_construction"),
+                "search_ef": config.get("ef_search")
+            }
+        metadata = collection.metadata or {}
+        return {param: metadata.get(f"hnsw:{param}") for param in HNSW_PARAMS}
+
+    def _set_search_ef(self, collection, search_ef):
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+
+    def reopen(self):
+        """
+        Reabre as conexões com o disco em um processo filho (após um fork)
+
+        Os modelos carregados antes do fork continuam compartilhados
+        (copy-on-write); apenas o cliente do ChromaDB, cujas threads e
+        conexões não sobrevivem ao fork, e o cache SQLite são reabertos.
+        """
+        from chromadb.api.client import SharedSystemClient
+
+        # O ChromaDB reaproveita o sistema do mesmo caminho; o do processo pai é descartado
+        SharedSystemClient.clear_system_cache()
+        self._open_client()
+        if self.encoder.cache is not None:
+            self.encoder.cache.reopen()
+
     def index(self, index_name, id, body):
         """Indexa um documento no ChromaDB"""
-        content = body.get('content', '')
-        article_name = body.get('article_name', 'Unknown')
-        url = body.get('article_fulldoc_url', '')
-        article_id = body.get('article_id', id)
-        
-        # Gerar embedding
-        embedding = self.model.encode(content).tolist()
-        
-        # Preparar metadados
+        self.index_many(index_name, [(id, body)], batch_size=1)
+
+    def index_many(self, index_name, items, batch_size=64):
+        """
+        Indexa vários documentos no ChromaDB em lotes
+
+        Os textos de cada lote são codificados em uma única chamada ao modelo
+        e gravados com um único `upsert` na coleção, então reindexar um ID
+        existente substitui o documento em vez de falhar.
+
+        Args:
+            index_name: Nome do índice
+            items: Iterável de tuplas (id, body), pode ser um gerador
+            batch_size: Quantidade de documentos por lote
+
+        Returns:
+            Número de documentos indexados
+        """
+        total = 0
+        ids, contents, metadatas = [], [], []
+
+        for id, body in items:
+            content = body.get('content', '')
+            ids.append(id)
+            contents.append(content)
+            metadatas.append(self._build_metadata(id, body, content))
+
+            if len(ids) >= batch_size:
+                self._add_batch(index_name, ids, contents, metadatas, batch_size)
+                total += len(ids)
+                ids, contents, metadatas = [], [], []
+
+        if ids:
+            self._add_batch(index_name, ids, contents, metadatas, batch_size)
+            total += len(ids)
+
+        # Sem documentos novos (ex.: artigo inalterado), os caches continuam válidos
+        if total:
+            self._save_auxiliary_indexes(index_name)
+            self._bump_data_version()
+        return total
+
+    def _add_batch(self, index_name, ids, contents, metadatas, batch_size):
+        """Gera os embeddings de um lote e grava na coleção e nos índices auxiliares"""
+        with span("index_encode"):
+            embeddings = self.encoder.encode(contents, batch_size=batch_size).tolist()
+
+        with span("index_upsert"):
+            for shard_name, positions in self._route(index_name, ids, metadatas).items():
+                for collection in self._write_collections(shard_name):
+                    collection.upsert(
+                        documents=[contents[position] for position in positions],
+                        embeddings=[embeddings[position] for position in positions],
+                        metadatas=[metadatas[position] for position in positions],
+                        ids=[ids[position] for position in positions]
+                    )
+        with span("index_auxiliary"):
+            self._get_lexical_index(index_name).add(ids, contents)
+            self._get_article_index(index_name).add(metadata["article_name"] for metadata in metadatas)
+        INDEXED_DOCUMENTS.labels(index_name).inc(len(ids))
+
+    def update_metadata(self, index_name, items):
+        """
+        Atualiza apenas os metadados de documentos existentes (sem recalcular embeddings)
+
+        Args:
+            index_name: Nome do índice
+            items: Lista de tuplas (id, body)
+        """
+        if not items:
+            return
+        ids = [id for id, _ in items]
+        metadatas = [self._build_metadata(id, body, body.get('content', '')) for id, body in items]
+        old_names = self._article_names(index_name, ids)
+        if index_name != "summary_index" and self.router.key == "year" and len(self.router.names) > 1:
+            self._update_year_shards(ids, metadatas)
+        else:
+            for shard_name, positions in self._route(index_name, ids, metadatas, by_id=True).items():
+                for collection in self._write_collections(shard_name):
+                    collection.update(
+                        ids=[ids[position] for position in positions],
+                        metadatas=[metadatas[position] for position in positions]
+                    )
+        article_index = self._get_article_index(index_name)
+        article_index.add(metadata["article_name"] for metadata in metadatas)
+        # Um artigo renomeado deixa de responder pelo nome antigo
+        self._prune_article_names(index_name, old_names - {metadata["article_name"] for metadata in metadatas})
+        self._save_auxiliary_indexes(index_name)
+        self._bump_data_version()
+
+    def _update_year_shards(self, ids, metadatas):
+        """
+        Atualiza metadados com shards por ano: documentos cujo ano mudou de faixa
+        são movidos (com o embedding já gravado) para o novo shard
+        """
+        targets = {doc_id: self.router.route(doc_id, metadata) for doc_id, metadata in zip(ids, metadatas)}
+        by_id = dict(zip(ids, metadatas))
+        for shard_name in self.router.names:
+            found = self._get_collection(shard_name).get(ids=ids, include=["documents", "embeddings"])
+            if not found["ids"]:
+                continue
+            stay = [doc_id for doc_id in found["ids"] if targets[doc_id] == shard_name]
+            moves = {}
+            for position, doc_id in enumerate(found["ids"]):
+                if targets[doc_id] != shard_name:
+                    moves.setdefault(targets[doc_id], []).append(position)
+
+            for target, positions in moves.items():
+                for collection in self._write_collections(target):
+                    collection.upsert(
+                        ids=[found["ids"][position] for position in positions],
+                        documents=[found["documents"][position] for position in positions],
+                        embeddings=[found["embeddings"][position] for position in positions],
+                        metadatas=[by_id[found["ids"][position]] for position in positions]
+                    )
+            for collection in self._write_collections(shard_name):
+                if stay:
+                    collection.update(ids=stay, metadatas=[by_id[doc_id] for doc_id in stay])
+                moved = [doc_id for doc_id in found["ids"] if targets[doc_id] != shard_name]
+                if moved:
+                    collection.delete(ids=moved)
+
+    def delete(self, index_name, ids):
+        """Remove documentos de um índice pelos IDs"""
+        if not ids:
+            return
+        names = self._article_names(index_name, ids)
+        for shard_name, shard_ids in self._route_ids(index_name, ids).items():
+            for collection in self._write_collections(shard_name):
+                collection.delete(ids=shard_ids)
+        self._get_lexical_index(index_name).remove(ids)
+        self._prune_article_names(index_name, names)
+        self._save_auxiliary_indexes(index_name)
+        self._bump_data_version()
+
+    def find_ids(self, index_name, where):
+        """IDs dos documentos do índice (todos os shards) que atendem ao filtro `where`"""
+        ids = []
+        for collection in self._get_collections(index_name):
+            ids.extend(collection.get(where=where, include=[])["ids"])
+        return ids
+
+    def _article_names(self, index_name, ids):
+        """Nomes de artigo gravados nos documentos (lidos antes de uma remoção ou renomeação)"""
+        names = set()
+        for shard_name, shard_ids in self._route_ids(index_name, ids).items():
+            found = self._get_collection(shard_name).get(ids=shard_ids, include=["metadatas"])
+            names.update(metadata.get("article_name", "Unknown") for metadata in found["metadatas"] if metadata)
+        return names
+
+    def _prune_article_names(self, index_name, names):
+        """Tira do índice de nomes os artigos que não têm mais nenhum documento no índice"""
+        orphaned = [
+            name for name in names
+            if not any(
+                collection.get(where={"article_name": name}, limit=1, include=[])["ids"]
+                for collection in self._get_collections(index_name)
+            )
+        ]
+        self._get_article_index(index_name).remove(orphaned)
+
+    def data_version(self):
+        """Versão dos dados das coleções (muda a cada escrita, de qualquer processo)"""
+        try:
+            return os.stat(DATA_VERSION_PATH).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _bump_data_version(self):
+        os.makedirs(os.path.dirname(os.path.abspath(DATA_VERSION_PATH)), exist_ok=True)
+        with open(DATA_VERSION_PATH, "a"):
+            pass
+        os.utime(DATA_VERSION_PATH)
+
+    def _build_metadata(self, id, body, content):
+        """Monta os metadados de um documento"""
         metadata = {
-            "article_name": article_name,
-            "url": url,
-            "article_id": article_id,
+            "article_name": body.get('article_name', 'Unknown'),
+            "url": body.get('article_fulldoc_url', ''),
+            "article_id": body.get('article_id', id),
             "content_length": len(content)
         }
+        # Campos opcionais usados pela ingestão incremental
+        for field in ("chunk_index", "content_hash", "publication_year"):
+            if body.get(field) is not None:
+                metadata[field] = body[field]
+        return metadata
+
+    def shard_names(self, index_name, year_range=None):
+        """
+        Coleções lógicas que formam o índice: ele mesmo ou seus shards (um shard
+        resolve para si); com year_range, só os shards que cobrem a faixa
+        """
+        if index_name == "summary_index":
+            return ["summary_index"]
+        if index_name in self.router.names:
+            return [index_name]
+        return self.router.names_for_years(year_range)
+
+    def _stored_count(self, index_name):
+        """Documentos já gravados no índice, sem abrir os shards que ainda não existem"""
+        existing = {getattr(collection, "name", collection) for collection in self.client.list_collections()}
+        total = 0
+        for shard_name in self.shard_names(index_name):
+            name = self.aliases.collection_name(shard_name)
+            if name in existing:
+                collection = self.collections.get(shard_name) or self.client.get_collection(name)
+                total += collection.count()
+        return total
+
+    def _route(self, index_name, ids, metadatas, by_id=False):
+        """Agrupa as posições de um lote pelo shard de destino: {shard: [posições]}"""
+        if index_name == "summary_index":
+            return {"summary_index": list(range(len(ids)))}
+        if by_id:
+            # Atualizações vão para onde o documento já está
+            positions = {doc_id: position for position, doc_id in enumerate(ids)}
+            return {
+                shard_name: [positions[doc_id] for doc_id in shard_ids]
+                for shard_name, shard_ids in self.router.route_ids(ids).items()
+            }
+        grouped = {}
+        for position, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+            grouped.setdefault(self.router.route(doc_id, metadata), []).append(position)
+        return grouped
+
+    def _route_ids(self, index_name, ids):
+        """Agrupa IDs pelo shard que os guarda: {shard: [ids]}"""
+        if index_name == "summary_index":
+            return {"summary_index": list(ids)}
+        return self.router.route_ids(ids)
+
+    def _get_collection(self, shard_name):
+        """Retorna a coleção de um shard (ou índice sem shards), abrindo-a se ainda estiver fria"""
+        names = self.shard_names(shard_name)
+        if len(names) > 1:
+            raise ValueError(f"{shard_name} tem {len(names)} shards; use _get_collections")
+        shard_name = names[0]
+        self._sync_aliases()
+        collection = self.collections.get(shard_name)
+        if collection is None:
+            with self._shard_lock:
+                collection = self.collections.get(shard_name) or self._open_collection(shard_name)
+        return collection
+
+    def _get_collections(self, index_name):
+        """Coleções de todos os shards do índice, na ordem dos shards"""
+        return [self._get_collection(shard_name) for shard_name in self.shard_names(index_name)]
+
+    def _year_filter(self, year_range, where=None):
+        """Acrescenta a faixa (inicio, fim) de publication_year a um filtro `where`"""
+        if year_range is None:
+            return where
+        start, end = year_range
+        conditions = [where] if where else []
+        if start is not None:
+            conditions.append({"publication_year": {"$gte": start}})
+        if end is not None:
+            conditions.append({"publication_year": {"$lte": end}})
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions} if conditions else None
+
+    def _sync_aliases(self, force=False):
+        """Segue uma troca de coleção feita por outro processo (reconstrução concluída)"""
+        if self.aliases.refresh(force=force):
+            for name, collection in list(self.collections.items()):
+                if collection.name != self.aliases.collection_name(name):
+                    self._open_collection(name)
+
+    def _write_collections(self, shard_name):
+        """
+        Coleções que recebem as escritas do shard: a de leitura e, durante uma
+        reconstrução, também a nova
+        """
+        # Escritas são raras: o alias é conferido sempre, sem esperar o intervalo de recarga
+        self._sync_aliases(force=True)
+        collections = [self._get_collection(shard_name)]
+        name = self.aliases.building_name(shard_name)
+        if name is not None:
+            try:
+                collections.append(self.client.get_collection(name))
+            except Exception:
+                pass
+        return collections
+
+    def _get_lexical_index(self, index_name):
+        """Retorna o índice BM25 correspondente ao índice"""
+        return self.lexical_indexes["summary_index" if index_name == "summary_index" else "full_document_index"]
+
+    def _get_article_index(self, index_name):
+        """Retorna o índice de nomes de artigos correspondente ao índice"""
+        return self.article_indexes["summary_index" if index_name == "summary_index" else "full_document_index"]
+
+    def _save_auxiliary_indexes(self, index_name):
+        self._get_lexical_index(index_name).save()
+        self._get_article_index(index_name).save()
+
+    def _clear_auxiliary_indexes(self, index_name):
+        for auxiliary_index in (self._get_lexical_index(index_name), self._get_article_index(index_name)):
+            auxiliary_index.clear()
+            auxiliary_index.save()
+
+    def rebuild_auxiliary_indexes(self, index_name, page_size=1000):
+        """Reconstrói o índice BM25 e o de nomes de artigos a partir da coleção"""
+        lexical_index = self._get_lexical_index(index_name)
+        article_index = self._get_article_index(index_name)
+        lexical_index.clear()
+        article_index.clear()
+
+        for collection in self._get_collections(index_name):
+            offset = 0
+            while True:
+                page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                lexical_index.add(page["ids"], page["documents"])
+                article_index.add(metadata.get("article_name", "Unknown") for metadata in page["metadatas"])
+                offset += len(page["ids"])
+
+        self._save_auxiliary_indexes(index_name)
+        print(f"Índices auxiliares de {index_name} reconstruídos: {len(lexical_index)} documentos, {len(article_index)} artigos")
+
+    def encode_query(self, query):
+        """
+        Gera o embedding de uma query com o mesmo modelo usado na indexação
+
+        Os vetores das queries recentes ficam em um cache LRU em memória; em
+        caso de falta, a codificação passa pelo cache persistente de embeddings.
+        """
+        key = normalize_text(query)
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            with span("encode_query"):
+                embedding = self.encoder.encode(query).tolist()
+            self.query_cache.put(key, embedding)
+        return embedding
+
+    def encode_queries(self, queries):
+        """
+        Gera os embeddings de várias queries com uma única chamada ao modelo
+
+        Usa o mesmo cache LRU de encode_query; só as queries ausentes dele
+        passam pelo encoder (e pelo cache persistente).
+        """
+        keys = [normalize_text(query) for query in queries]
+        embeddings = {}
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key in embeddings or key in missing:
+                continue
+            embedding = self.query_cache.get(key)
+            if embedding is None:
+                missing[key] = query
+            else:
+                embeddings[key] = embedding
         
-        # Escolher coleção baseada no índice
-        collection = self.summary_collection if index_name == "summary_index" else self.full_collection
+        if missing:
+            vectors = self.encoder.encode(list(missing.values())).tolist()
+            for key, embedding in zip(missing, vectors):
+                self.query_cache.put(key, embedding)
+                embeddings[key] = embedding
         
-        # Adicionar documento
-        collection.add(
-            documents=[content],
-            embeddings=[embedding],
-            metadatas=[metadata],
-            ids=[id]
-        )
+        return [embeddings[key] for key in keys]
+
+    def search_batch(self, index_name, queries, k=5, search_type="hybrid", year_range=None):
+        """
+        Busca várias queries de uma vez, retornando os resultados na mesma ordem
+
+        As queries são codificadas em um único lote e a parte semântica é uma
+        única consulta multi-vetor em cada shard; a parte léxica roda no índice
+        BM25 em paralelo e carrega os documentos com um único `get` por shard.
+        Com year_range, só os shards da faixa de anos são consultados.
+
+        Returns:
+            Uma lista de Hits por query
+        """
+        if not queries:
+            return []
+        
+        lexical_future = None
+        if search_type != "semantic":
+            lexical_future = self._get_executor().submit(
+                contextvars.copy_context().run, self._lexical_search_batch, index_name, queries, k, year_range
+            )
+        
+        semantic_lists = None
+        if search_type != "lexical":
+            semantic_lists = self._query_shards(index_name, self.encode_queries(queries), k, year_range=year_range)
+        
+        lexical_lists = lexical_future.result() if lexical_future is not None else None
+        
+        if search_type == "semantic":
+            combined = semantic_lists
+        elif search_type == "lexical":
+            combined = lexical_lists
+        else:
+            combined = [
+                self._combine_results([semantic, lexical], k)
+                for semantic, lexical in zip(semantic_lists, lexical_lists)
+            ]
+        
+        return combined
 
-    def search(self, index_name, query, k=5, search_type="hybrid"):
+    def search(self, index_name, query, k=5, search_type="hybrid", query_embedding=None, timeout_ms=None,
+               rerank=None, rerank_query=None, year_range=None):
         """
         Busca híbrida: combina busca semântica (embedding) com busca léxica (texto)
         
@@ -72,170 +660,458 @@ class ChromaVectorStore:
             query: Query de busca
             k: Número de resultados
             search_type: "semantic", "lexical", ou "hybrid"
+            query_embedding: Embedding da query já calculado (opcional)
+            timeout_ms: Prazo da busca em milissegundos (padrão SEARCH_TIMEOUT_MS)
+            rerank: Reordena RERANK_CANDIDATES candidatos com o cross-encoder
+                (padrão RERANK_ENABLED)
+            rerank_query: Texto comparado pelo cross-encoder (padrão: query)
+            year_range: Faixa (inicio, fim) de publication_year; None nos limites = aberto
+
+        Returns:
+            Lista de Hits em ordem de score (format_hits monta o dicionário da API)
+        """
+        return self.search_indexes(
+            [index_name], query, k, search_type, query_embedding, timeout_ms, rerank, rerank_query, year_range
+        )
+
+    def search_indexes(self, index_names, query, k=5, search_type="hybrid", query_embedding=None, timeout_ms=None,
+                       rerank=None, rerank_query=None, year_range=None):
+        """
+        Busca em um ou mais índices com as sub-consultas em paralelo
+
+        As buscas léxicas começam enquanto a query é codificada; em seguida as
+        semânticas, uma por shard, são disparadas no mesmo pool. Os shards de
+        cada índice são unidos pela similaridade e os índices combinados com
+        Reciprocal Rank Fusion; sub-consultas que não terminam dentro do prazo
+        são descartadas, então a latência é a da sub-consulta mais lenta
+        (limitada pelo prazo) e não a soma delas.
+
+        Com rerank, o primeiro estágio busca RERANK_CANDIDATES candidatos e o
+        cross-encoder escolhe os k finais entre eles. Com year_range, os
+        resultados são filtrados pelo ano e só os shards da faixa são consultados.
         """
-        collection = self.summary_collection if index_name == "summary_index" else self.full_collection
+        deadline = time.monotonic() + (timeout_ms or SEARCH_TIMEOUT_MS) / 1000
+        rerank = RERANK_ENABLED if rerank is None else rerank
+        final_k, k = k, max(k, RERANK_CANDIDATES) if rerank else k
+        tasks = []
+        shards = {index_name: self.shard_names(index_name, year_range) for index_name in index_names}
+        where = self._year_filter(year_range)
         
-        if search_type == "semantic":
-            # Busca apenas semântica
-            results = collection.query(
-                query_texts=[query],
-                n_results=k,
-                include=["documents", "metadatas", "distances"]
-            )
-        elif search_type == "lexical":
-            # Busca apenas léxica (where clause)
-            # ChromaDB não suporta $contains, então usamos busca semântica com filtro
-            results = collection.query(
-                query_texts=[query],
-                n_results=k,
-                include=["documents", "metadatas", "distances"]
-            )
-        else:  # hybrid
-            # Busca híbrida: combina semântica + léxica
-            semantic_results = collection.query(
-                query_texts=[query],
-                n_results=k,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            # Busca léxica adicional (sem filtro where devido a limitações do ChromaDB)
-            lexical_results = collection.query(
-                query_texts=[query],
-                n_results=k//2,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            # Combinar resultados
-            results = self._combine_results(semantic_results, lexical_results, k)
+        if search_type != "semantic":
+            for index_name in index_names:
+                tasks.append((f"lexical:{index_name}", self._lexical_search, (index_name, query, k, year_range)))
         
-        return self._format_results(results)
-
-    def search_specific(self, index_name, query, filename, k=20):
-        """Busca específica em um documento"""
-        collection = self.summary_collection if index_name == "summary_index" else self.full_collection
+        semantic_count = sum(len(names) for names in shards.values()) if search_type != "lexical" else 0
+        futures = self._submit(tasks) if len(tasks) + semantic_count > 1 else None
         
-        # Busca semântica (filtro por nome será aplicado no pós-processamento)
-        results = collection.query(
-            query_texts=[query],
-            n_results=k * 2,  # Buscar mais resultados para compensar a falta de filtro
-            include=["documents", "metadatas", "distances"]
-        )
+        # A query é codificada uma única vez e reutilizada em todas as consultas
+        if search_type != "lexical":
+            if query_embedding is None:
+                query_embedding = self.encode_query(query)
+            semantic_tasks = [
+                (f"semantic:{shard_name}", self._semantic_search, (self._get_collection(shard_name), query_embedding, k, where))
+                for index_name in index_names
+                for shard_name in shards[index_name]
+            ]
+            if futures is not None:
+                futures.update(self._submit(semantic_tasks))
+            tasks = semantic_tasks + tasks
         
-        # Filtrar resultados por nome do arquivo no pós-processamento
-        if results["documents"] and results["metadatas"]:
-            filtered_results = {
-                "documents": [],
-                "metadatas": [],
-                "distances": [],
-                "ids": []
-            }
-            
-            for i, metadata in enumerate(results["metadatas"][0]):
-                article_name = metadata.get("article_name", "")
-                if filename.lower() in article_name.lower():
-                    filtered_results["documents"].append(results["documents"][0][i])
-                    filtered_results["metadatas"].append(metadata)
-                    filtered_results["distances"].append(results["distances"][0][i])
-                    filtered_results["ids"].append(results["ids"][0][i])
+        if futures is None:
+            # Uma única sub-consulta roda na própria thread
+            label, function, args = tasks[0]
+            results = function(*args)
+        else:
+            with span("gather"):
+                completed = self._gather(futures, deadline)
             
-            # Limitar a k resultados
-            filtered_results["documents"] = filtered_results["documents"][:k]
-            filtered_results["metadatas"] = filtered_results["metadatas"][:k]
-            filtered_results["distances"] = filtered_results["distances"][:k]
-            filtered_results["ids"] = filtered_results["ids"][:k]
-            
-            return self._format_results(filtered_results)
+            # Ordem fixa (semânticas antes das léxicas) para desempates estáveis na fusão
+            result_lists = []
+            if search_type != "lexical":
+                for index_name in index_names:
+                    shard_lists = [
+                        completed[f"semantic:{shard_name}"] for shard_name in shards[index_name]
+                        if f"semantic:{shard_name}" in completed
+                    ]
+                    if shard_lists:
+                        result_lists.append(self._merge_shards(shard_lists, k))
+            result_lists.extend(completed[label] for label, _, _ in tasks if label.startswith("lexical:") and label in completed)
+            if len(index_names) == 1 and search_type != "hybrid":
+                # Só os shards de um índice: mantém a similaridade, sem fusão
+                results = result_lists[0] if result_lists else []
+            else:
+                with span("fuse_results"):
+                    results = self._combine_results(result_lists, k)
+
+        if rerank:
+            return self.reranker.rerank(rerank_query or query, results, final_k)
+        return results
+
+    def _get_executor(self):
+        # Threads não sobrevivem a um fork, então o pool é criado em cada processo
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._executor_lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="search")
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _submit(self, tasks):
+        """Submete as sub-consultas ao pool, cada uma no contexto da requisição (para os spans dela)"""
+        executor = self._get_executor()
+        return {
+            executor.submit(contextvars.copy_context().run, function, *args): label
+            for label, function, args in tasks
+        }
+
+    def _gather(self, futures, deadline):
+        """Coleta os resultados das sub-consultas que terminarem até o prazo"""
+        completed = {}
+        try:
+            for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+                label = futures[future]
+                try:
+                    completed[label] = future.result()
+                except Exception as e:
+                    print(f"Erro na sub-consulta {label}: {e}")
+        except FuturesTimeoutError:
+            for future, label in futures.items():
+                if not future.done():
+                    future.cancel()
+                    print(f"Sub-consulta {label} excedeu o prazo e foi descartada")
+        return completed
+
+    def search_specific(self, index_name, query, filename, k=20, query_embedding=None, year_range=None):
+        """
+        Busca específica em um documento
+
+        O nome informado é resolvido para os nomes exatos dos artigos pelo
+        índice de nomes (sem acentos/caixa, prefixo e aproximado) e a consulta
+        vetorial é restrita a eles com um filtro `where`.
+        """
+        with span("resolve_article"):
+            article_names = self._get_article_index(index_name).resolve(filename)
+        if not article_names:
+            print(f"Nenhum artigo encontrado para: {filename}")
+            return []
+        
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
         
-        return self._format_results(results)
+        with span("specific_query"):
+            return self._query_shards(
+                index_name, [query_embedding], k,
+                where={"article_name": {"$in": article_names}},
+                year_range=year_range
+            )[0]
 
     def search_with_filter(self, index_name, query, filter_field, filter_value, k=5):
         """
         Busca com filtro usando operadores suportados pelo ChromaDB
         """
-        collection = self.summary_collection if index_name == "summary_index" else self.full_collection
-        
         # Usar operador $eq para filtros exatos
-        results = collection.query(
-            query_texts=[query],
-            n_results=k,
-            where={filter_field: {"$eq": filter_value}},
-            include=["documents", "metadatas", "distances"]
-        )
-        
-        return self._format_results(results)
+        return self._query_shards(
+            index_name, [self.encode_query(query)], k,
+            where={filter_field: {"$eq": filter_value}}
+        )[0]
 
     def search_with_in_filter(self, index_name, query, filter_field, filter_values, k=5):
         """
         Busca com filtro IN usando operadores suportados pelo ChromaDB
         """
-        collection = self.summary_collection if index_name == "summary_index" else self.full_collection
-        
         # Usar operador $in para filtros de lista
+        return self._query_shards(
+            index_name, [self.encode_query(query)], k,
+            where={filter_field: {"$in": filter_values}}
+        )[0]
+
+    def _query_shards(self, index_name, query_embeddings, k, where=None, year_range=None):
+        """
+        Consulta vetorial nos shards do índice (os da faixa de anos, se houver), em paralelo
+
+        Returns:
+            Uma lista de Hits por query, com os k mais similares entre os shards
+        """
+        shard_names = self.shard_names(index_name, year_range)
+        where = self._year_filter(year_range, where)
+        if len(shard_names) == 1:
+            return self._query_collection(self._get_collection(shard_names[0]), query_embeddings, k, where)
+
+        futures = self._submit([
+            (shard_name, self._query_collection, (self._get_collection(shard_name), query_embeddings, k, where))
+            for shard_name in shard_names
+        ])
+        with span("gather"):
+            completed = self._gather(futures, time.monotonic() + SEARCH_TIMEOUT_MS / 1000)
+        per_shard = [completed[shard_name] for shard_name in shard_names if shard_name in completed]
+        return [
+            self._merge_shards([hit_lists[position] for hit_lists in per_shard], k)
+            for position in range(len(query_embeddings))
+        ]
+
+    def _query_collection(self, collection, query_embeddings, k, where=None):
+        """Consulta vetorial em uma coleção: uma lista de Hits por query"""
         results = collection.query(
-            query_texts=[query],
+            query_embeddings=query_embeddings,
             n_results=k,
-            where={filter_field: {"$in": filter_values}},
+            where=where,
             include=["documents", "metadatas", "distances"]
         )
-        
-        return self._format_results(results)
+        return [self._unwrap_query(results, position) for position in range(len(query_embeddings))]
 
-    def _combine_results(self, semantic_results, lexical_results, k):
-        """Combina resultados de busca semântica e léxica"""
-        combined = {
-            "documents": [],
-            "metadatas": [],
-            "distances": [],
-            "ids": []
-        }
+    def _merge_shards(self, hit_lists, k):
+        """
+        Junta os Hits semânticos dos shards de um índice: os k de maior similaridade
+
+        Cada lista já vem ordenada e as similaridades de cosseno são comparáveis
+        entre shards, então basta intercalar as listas com um heap.
+        """
+        if len(hit_lists) == 1:
+            return hit_lists[0][:k]
+        merged = heapq.merge(*hit_lists, key=lambda hit: hit.score, reverse=True)
+        return list(itertools.islice(merged, k))
+
+    def _semantic_search(self, collection, query_embedding, k, where=None):
+        """Busca vetorial na coleção"""
+        with span("semantic_query"):
+            return self._query_collection(collection, [query_embedding], k, where)[0]
+
+    def _lexical_search(self, index_name, query, k, year_range=None):
+        """Busca no índice BM25 e carrega os documentos encontrados dos shards"""
+        with span("lexical_query"):
+            return self._lexical_search_batch(index_name, [query], k, year_range)[0]
+
+    def _lexical_search_batch(self, index_name, queries, k, year_range=None):
+        """Busca léxica de várias queries, carregando os documentos com um único get por shard"""
+        lexical_index = self._get_lexical_index(index_name)
+        candidates = k * YEAR_FILTER_OVERSAMPLE if year_range is not None else k
+        matches_per_query = [lexical_index.search(query, candidates) for query in queries]
         
-        # Adicionar resultados semânticos
-        if semantic_results["documents"]:
-            combined["documents"].extend(semantic_results["documents"][0])
-            combined["metadatas"].extend(semantic_results["metadatas"][0])
-            combined["distances"].extend(semantic_results["distances"][0])
-            combined["ids"].extend(semantic_results["ids"][0])
-        
-        # Adicionar resultados léxicos (evitando duplicatas)
-        if lexical_results["documents"]:
-            for i, doc_id in enumerate(lexical_results["ids"][0]):
-                if doc_id not in combined["ids"]:
-                    combined["documents"].append(lexical_results["documents"][0][i])
-                    combined["metadatas"].append(lexical_results["metadatas"][0][i])
-                    combined["distances"].append(lexical_results["distances"][0][i])
-                    combined["ids"].append(doc_id)
-        
-        # Limitar a k resultados
-        combined["documents"] = combined["documents"][:k]
-        combined["metadatas"] = combined["metadatas"][:k]
-        combined["distances"] = combined["distances"][:k]
-        combined["ids"] = combined["ids"][:k]
+        unique_ids = list(dict.fromkeys(doc_id for matches in matches_per_query for doc_id, _ in matches))
+        by_id = self._fetch_by_ids(index_name, unique_ids, year_range)
         
-        return combined
+        return [
+            [Hit(doc_id, score, *by_id[doc_id]) for doc_id, score in matches if doc_id in by_id][:k]
+            for matches in matches_per_query
+        ]
+
+    def _fetch_by_ids(self, index_name, ids, year_range=None):
+        """
+        Carrega documentos e metadados dos shards que guardam os IDs: {id: (documento, metadados)}
 
-    def _format_results(self, results):
-        """Formata resultados para compatibilidade com o sistema existente"""
-        if not results["documents"]:
+        Com year_range, só os shards da faixa são lidos e os documentos de outros anos ficam de fora.
+        """
+        if not ids:
             return {}
-        
-        grouped_docs = defaultdict(str)
-        
-        for i, content in enumerate(results["documents"]):
-            if i < len(results["metadatas"]):
-                article_name = results["metadatas"][i].get("article_name", "Unknown Article")
-                grouped_docs[article_name] += content + " "
-        
-        return dict(grouped_docs)
+
+        routed = self._route_ids(index_name, ids)
+        if year_range is not None:
+            allowed = set(self.shard_names(index_name, year_range))
+            routed = {shard_name: shard_ids for shard_name, shard_ids in routed.items() if shard_name in allowed}
+
+        where = self._year_filter(year_range)
+        by_id = {}
+        for shard_name, shard_ids in routed.items():
+            found = self._get_collection(shard_name).get(ids=shard_ids, where=where, include=["documents", "metadatas"])
+            by_id.update(
+                (doc_id, (document, metadata))
+                for doc_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+            )
+        return by_id
+
+    def _unwrap_query(self, results, position=0):
+        """Converte o resultado de uma das queries de uma consulta em Hits"""
+        fields = []
+        for field in ("ids", "documents", "metadatas", "distances"):
+            values = results.get(field) or []
+            fields.append(values[position] if position < len(values) else [])
+        return hits_from_query(*fields)
+
+    def _combine_results(self, hit_lists, k):
+        """
+        Combina listas de Hits (semânticas e léxicas) com Reciprocal Rank Fusion
+
+        Cada documento recebe a soma de 1 / (RRF_K + posição) nas listas em que
+        aparece, o que dispensa normalizar distâncias de cosseno e scores BM25.
+        O primeiro Hit de cada documento é reaproveitado com o score da fusão.
+        """
+        fused = {}
+        for hits in hit_lists:
+            for rank, hit in enumerate(hits):
+                entry = fused.get(hit.id)
+                if entry is None:
+                    entry = fused[hit.id] = [0.0, hit]
+                entry[0] += 1.0 / (RRF_K + rank + 1)
+
+        ranked = sorted(fused.values(), key=lambda entry: entry[0], reverse=True)[:k]
+        for score, hit in ranked:
+            hit.score = score
+        return [hit for _, hit in ranked]
 
     def get_collection_stats(self, index_name):
-        """Retorna estatísticas da coleção"""
-        collection = self.summary_collection if index_name == "summary_index" else self.full_collection
-        return collection.count()
+        """Retorna estatísticas da coleção (soma dos shards)"""
+        return sum(collection.count() for collection in self._get_collections(index_name))
+
+    def hnsw_config(self, index_name):
+        """Coleção física atual do índice e seus parâmetros HNSW (por shard, se houver mais de um)"""
+        configs = [
+            {
+                "collection": collection.name,
+                "count": collection.count(),
+                "hnsw": self._current_hnsw_params(collection)
+            }
+            for collection in self._get_collections(index_name)
+        ]
+        if len(configs) == 1:
+            return configs[0]
+        return {"count": sum(config["count"] for config in configs), "shards": configs}
+
+    def set_search_ef(self, index_name, search_ef):
+        """Altera o search_ef das coleções atuais do índice, sem reconstruí-las"""
+        for collection in self._get_collections(index_name):
+            self._set_search_ef(collection, search_ef)
+
+    def rebuild_collection(self, index_name, params=None, page_size=1000, grace_seconds=None, keep_old=False):
+        """
+        Reconstrói o índice HNSW de uma coleção com novos parâmetros, sem parar as leituras
+
+        Os embeddings já gravados são copiados para uma nova coleção (nada é
+        recodificado). Enquanto a cópia acontece, as escritas de todos os
+        processos vão para as duas coleções; ao final, os IDs são conciliados
+        e o alias passa a apontar para a nova coleção.
+
+        Um índice com shards é reconstruído um shard por vez.
+
+        Args:
+            index_name: Nome do índice ou de um shard
+            params: Parâmetros HNSW (M, construction_ef, search_ef); os omitidos
+                vêm do ambiente ou do padrão do ChromaDB
+            page_size: Documentos copiados por página
+            grace_seconds: Espera para os outros processos verem cada mudança de alias
+            keep_old: Mantém a coleção antiga em vez de apagá-la após a troca
+
+        Returns:
+            Dicionário com as coleções antiga e nova e a quantidade copiada
+            (uma lista deles, um por shard)
+        """
+        shard_names = self.shard_names(index_name)
+        if len(shard_names) > 1:
+            return [
+                self.rebuild_collection(shard_name, params, page_size, grace_seconds, keep_old)
+                for shard_name in shard_names
+            ]
+
+        grace_seconds = HNSW_REBUILD_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        index_name = shard_names[0]
+        parent_name = "summary_index" if index_name == "summary_index" else "full_document_index"
+        params = {**hnsw_params(parent_name), **{k: v for k, v in (params or {}).items() if v is not None}}
+
+        source = self._get_collection(index_name)
+        if self.aliases.building_name(index_name):
+            raise RuntimeError(f"Já existe uma reconstrução de {index_name} em andamento")
+        target_name = self._next_collection_name(index_name)
+        target = self.client.create_collection(name=target_name, metadata=collection_metadata(parent_name, params))
+        self.aliases.set_building(index_name, target_name)
+        print(f"🔨 Reconstruindo {index_name}: {source.name} -> {target_name} {params}")
+
+        try:
+            # Lotes já em andamento em outros processos terminam antes da cópia começar
+            time.sleep(grace_seconds)
+            # O índice HNSW em memória só vê o que este processo gravou; reabrir o cliente
+            # carrega também o que os outros processos gravaram
+            self.reopen()
+            source, target = self.client.get_collection(source.name), self.client.get_collection(target_name)
+            copied = self._copy_documents(source, target, page_size)
+
+            # Páginas deslocadas por escritas concorrentes: o que faltou é copiado, o que sobrou sai
+            self.reopen()
+            source, target = self.client.get_collection(source.name), self.client.get_collection(target_name)
+            source_ids, target_ids = self._collection_ids(source, page_size), self._collection_ids(target, page_size)
+            missing, extra = source_ids - target_ids, target_ids - source_ids
+            if missing:
+                copied += self._copy_documents(source, target, page_size, ids=sorted(missing))
+            if extra:
+                target.delete(ids=sorted(extra))
+        except BaseException:
+            self.aliases.set_building(index_name, None)
+            self.client.delete_collection(target_name)
+            raise
+
+        self.aliases.switch(index_name, target_name)
+        self.collections[index_name] = target
+        print(f"✅ Leituras de {index_name} agora em {target_name} ({target.count()} documentos)")
+
+        if not keep_old:
+            # Os outros processos passam para a nova coleção antes de a antiga sumir
+            time.sleep(grace_seconds)
+            self.client.delete_collection(source.name)
+            print(f"Coleção antiga {source.name} removida")
+
+        return {"index": index_name, "old": source.name, "new": target_name, "copied": copied, "hnsw": params}
+
+    def _next_collection_name(self, index_name):
+        """Próximo nome versionado livre para a coleção física do índice (summary_index_v2, ...)"""
+        prefix = f"{index_name}_v"
+        versions = [0]
+        for collection in self.client.list_collections():
+            name = getattr(collection, "name", collection)
+            if name.startswith(prefix) and name[len(prefix):].isdigit():
+                versions.append(int(name[len(prefix):]))
+        return f"{prefix}{max(versions) + 1}"
+
+    def _copy_documents(self, source, target, page_size, ids=None):
+        """
+        Copia documentos com seus embeddings, página a página
+
+        Usa `add`, que ignora IDs já presentes: uma escrita feita nas duas
+        coleções durante a cópia não é sobrescrita pela versão anterior.
+        """
+        copied = 0
+        offset = 0
+        while True:
+            query = {"limit": page_size, "offset": offset} if ids is None else {"ids": ids[offset:offset + page_size]}
+            try:
+                page = source.get(include=["embeddings", "documents", "metadatas"], **query)
+                embeddings = page["embeddings"]
+            except Exception:
+                # Vetores gravados por outro processo após a abertura do cliente: vêm do
+                # cache de embeddings, pelo texto, sem passar pelo modelo
+                page = source.get(include=["documents", "metadatas"], **query)
+                embeddings = self.encoder.encode(page["documents"], batch_size=page_size) if page["ids"] else []
+            if not len(page["ids"]):
+                break
+            target.add(
+                ids=page["ids"],
+                embeddings=embeddings,
+                documents=page["documents"],
+                metadatas=page["metadatas"]
+            )
+            copied += len(page["ids"])
+            offset += page_size
+            if ids is not None and offset >= len(ids):
+                break
+        return copied
+
+    def _collection_ids(self, collection, page_size):
+        ids = set()
+        offset = 0
+        while True:
+            page = collection.get(include=[], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return ids
+            ids.update(page["ids"])
+            offset += len(page["ids"])
 
     def delete_collection(self, index_name):
-        """Deleta uma coleção"""
+        """Deleta uma coleção (todos os shards do índice)"""
         try:
-            self.client.delete_collection(index_name)
+            for shard_name in self.shard_names(index_name):
+                self.client.delete_collection(self.aliases.collection_name(shard_name))
+                self.aliases.reset(shard_name)
+                # Recriada vazia no próximo acesso
+                self.collections.pop(shard_name, None)
+            self._clear_auxiliary_indexes(index_name)
+            self._bump_data_version()
             print(f"Coleção {index_name} deletada com sucesso")
         except Exception as e:
             print(f"Erro ao deletar coleção {index_name}: {e}")
@@ -244,6 +1120,11 @@ class ChromaVectorStore:
         """Reseta todas as coleções"""
         try:
             self.client.reset()
+            self.aliases.reset()
+            self.collections = {}
+            for index_name in ("summary_index", "full_document_index"):
+                self._clear_auxiliary_indexes(index_name)
+            self._bump_data_version()
             print("Todas as coleções foram resetadas")
         except Exception as e:
             print(f"Erro ao resetar coleções: {e}") 
\ No newline at end of file
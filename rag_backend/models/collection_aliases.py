@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (um escritor por vez)
+    fcntl = None
+
+
+class CollectionAliases:
+    """
+    Mapeia cada índice lógico (summary_index, full_document_index) para a
+    coleção física do ChromaDB que atende as leituras
+
+    Durante uma reconstrução o arquivo também registra a coleção em
+    construção, para que as escritas de qualquer processo sejam duplicadas
+    nela. A troca é feita regravando o arquivo com `os.replace`, então os
+    leitores veem o mapeamento antigo ou o novo, nunca um intermediário.
+    Cada alteração relê o arquivo, muda o mapeamento e o regrava sob uma
+    trava de arquivo (`{path}.lock`), para que alterações simultâneas de
+    processos diferentes (rebuild_index.py, workers, ingestão) não se percam.
+    """
+
+    def __init__(self, path=None, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self.active = {}         # índice lógico -> coleção de leitura
+        self.building = {}       # índice lógico -> coleção em reconstrução
+        self._loaded_mtime = None
+        self._last_reload_check = 0.0
+        self._load()
+
+    def collection_name(self, index_name):
+        """Nome da coleção física lida para o índice (o próprio nome, por padrão)"""
+        with self._lock:
+            return self.active.get(index_name, index_name)
+
+    def building_name(self, index_name):
+        with self._lock:
+            return self.building.get(index_name)
+
+    def set_building(self, index_name, collection_name):
+        with self._updating():
+            if collection_name is None:
+                self.building.pop(index_name, None)
+            else:
+                self.building[index_name] = collection_name
+
+    def switch(self, index_name, collection_name):
+        """Passa as leituras do índice para `collection_name` e encerra a reconstrução"""
+        with self._updating():
+            self.active[index_name] = collection_name
+            self.building.pop(index_name, None)
+
+    def reset(self, index_name=None):
+        with self._updating():
+            if index_name is None:
+                self.active, self.building = {}, {}
+            else:
+                self.active.pop(index_name, None)
+                self.building.pop(index_name, None)
+
+    @contextmanager
+    def _updating(self):
+        """
+        Relê o arquivo, deixa o bloco alterar o mapeamento e o regrava
+
+        Tudo sob a trava de arquivo, para que a alteração parta do estado
+        gravado por outros processos e nenhuma troca concorrente se perca.
+        """
+        with self._lock, self._file_lock():
+            if self.path and os.path.exists(self.path):
+                self._load()
+            elif self.path:
+                self.active, self.building = {}, {}
+            yield
+            self.save()
+
+    @contextmanager
+    def _file_lock(self):
+        """Trava exclusiva entre processos (nula sem `path` ou sem fcntl)"""
+        if not self.path:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.")
+            try:
+                with open(fd, "w", encoding="utf-8") as f:
+                    json.dump({"active": self.active, "building": self.building}, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.active = data.get("active", {})
+            self.building = data.get("building", {})
+            self._loaded_mtime = mtime
+
+    def refresh(self, force=False):
+        """
+        Recarrega o arquivo se ele foi alterado por outro processo
+
+        Returns:
+            True se o mapeamento mudou
+        """
+        if not self.path:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_reload_check < self.reload_interval:
+            return False
+        self._last_reload_check = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._loaded_mtime:
+            return False
+        with self._lock:
+            previous = (dict(self.active), dict(self.building))
+            if mtime is None:
+                self.active, self.building = {}, {}
+                self._loaded_mtime = None
+            else:
+                self._load()
+            return previous != (self.active, self.building)
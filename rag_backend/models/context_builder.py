@@ -0,0 +1,146 @@
+import os
+
+from .hits import Hit
+
+# Orçamento do prompt em tokens (instruções + documentos + pergunta)
+LLM_PROMPT_TOKENS = int(os.getenv("LLM_PROMPT_TOKENS", "512"))
+
+# Trechos que sobrariam com menos tokens que isso não entram cortados no prompt
+MIN_CHUNK_TOKENS = int(os.getenv("MIN_CHUNK_TOKENS", "32"))
+
+# Sobreposição mínima (caracteres) para considerar que chunks vizinhos repetem texto
+MIN_OVERLAP_CHARS = 20
+
+PROMPT_HEADER = "Com base nos seguintes documentos, responda à pergunta do usuário.\n\nDocumentos:\n"
+PROMPT_FOOTER = "\n\nPergunta: {query}\n\nResposta:"
+
+
+def overlap_length(previous, current, max_overlap=400):
+    """Tamanho do maior sufixo de `previous` que também é prefixo de `current`"""
+    for size in range(min(len(previous), len(current), max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:size]):
+            return size
+    return 0
+
+
+def hits_from_documents(retrieved_docs):
+    """Hits a partir do dicionário artigo -> texto (a ordem do dicionário é o ranking)"""
+    return [
+        Hit(name, -rank, content, {"article_name": name})
+        for rank, (name, content) in enumerate(retrieved_docs.items())
+    ]
+
+
+class ContextBuilder:
+    """
+    Monta o prompt de resposta dentro de um orçamento exato de tokens
+
+    Os hits entram em ordem de score. O texto que um chunk repete de um
+    vizinho já escolhido do mesmo artigo (chunk_index adjacente, efeito do
+    chunk_overlap da ingestão) é removido antes de contar tokens, e chunks
+    idênticos entram uma vez só. Cada trecho é tokenizado uma única vez e os
+    IDs do prompt são a concatenação dos IDs dos trechos, então a contagem é
+    exata e a geração não precisa tokenizar o prompt de novo.
+
+    Sem tokenizer (LLM simulado), os tokens são as palavras do texto.
+    """
+
+    def __init__(self, tokenizer=None, budget=LLM_PROMPT_TOKENS, min_chunk_tokens=MIN_CHUNK_TOKENS):
+        self.tokenizer = tokenizer
+        self.budget = budget
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def encode(self, text):
+        if self.tokenizer is None:
+            return text.split()
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def decode(self, ids):
+        if self.tokenizer is None:
+            return " ".join(ids)
+        return self.tokenizer.decode(ids)
+
+    def build(self, hits, query):
+        """
+        Returns:
+            (prompt, input_ids, usados): texto do prompt, IDs para o modelo e
+            quantos chunks entraram
+        """
+        header = self.encode(PROMPT_HEADER)
+        footer = self.encode(PROMPT_FOOTER.format(query=query))
+        remaining = self.budget - len(header) - len(footer)
+        if remaining < 0:
+            # Pergunta maior que o orçamento: fica só o fim dela, sem documentos
+            keep = max(self.budget - len(header), 0)
+            footer = footer[len(footer) - keep:]
+            remaining = 0
+
+        selected = {}            # (artigo, chunk_index ou posição) -> [texto, ids]
+        labels = {}              # artigo -> (texto, ids) do rótulo "Artigo: "
+        article_order = []
+        seen_texts = set()
+        separator = self.encode(" ")
+
+        for position, hit in enumerate(sorted(hits, key=lambda hit: hit.score, reverse=True)):
+            if remaining < self.min_chunk_tokens:
+                break
+            text = hit.document.strip()
+            if not text or text in seen_texts:
+                continue
+            seen_texts.add(text)
+
+            article, index = hit.article_name, hit.chunk_index
+            if index is not None:
+                previous = selected.get((article, index - 1))
+                following = selected.get((article, index + 1))
+                if previous is not None:
+                    text = text[overlap_length(previous[0], text):].lstrip()
+                if following is not None and text:
+                    size = overlap_length(text, following[0])
+                    text = text[:len(text) - size].rstrip()
+                if not text:
+                    continue
+
+            cost = 0
+            label = None
+            if article not in labels:
+                label_text = f"{article}: " if not labels else f"\n\n{article}: "
+                label = (label_text, self.encode(label_text))
+                cost += len(label[1])
+            else:
+                cost += len(separator)
+            ids = self.encode(text)
+
+            if cost + len(ids) > remaining:
+                room = remaining - cost
+                if room < self.min_chunk_tokens:
+                    continue
+                ids = ids[:room]
+                text = self.decode(ids)
+
+            if label is not None:
+                labels[article] = label
+                article_order.append(article)
+            key = (article, index if index is not None else f"#{position}")
+            selected[key] = [text, ids]
+            remaining -= cost + len(ids)
+
+        # Artigos na ordem do melhor chunk; dentro do artigo, na ordem do texto
+        prompt_parts, input_ids = [PROMPT_HEADER], list(header)
+        for article in article_order:
+            prompt_parts.append(labels[article][0])
+            input_ids.extend(labels[article][1])
+            keys = sorted(
+                (key for key in selected if key[0] == article),
+                key=lambda key: (isinstance(key[1], str), key[1] if isinstance(key[1], int) else 0)
+            )
+            for position, key in enumerate(keys):
+                if position:
+                    prompt_parts.append(" ")
+                    input_ids.extend(separator)
+                prompt_parts.append(selected[key][0])
+                input_ids.extend(selected[key][1])
+        prompt_parts.append(PROMPT_FOOTER.format(query=query))
+        input_ids.extend(footer)
+
+        return "".join(prompt_parts), input_ids, len(selected)
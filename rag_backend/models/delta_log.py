@@ -0,0 +1,328 @@
+import io
+import os
+import pickle
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (um escritor por vez)
+    fcntl = None
+
+
+class DeltaLog:
+    """
+    Persistência incremental de um índice: snapshot + log de operações
+
+    O snapshot (o próprio arquivo do índice) só é regravado na compactação,
+    quando o log passa do tamanho do snapshot; cada gravação apenas acrescenta
+    ao log os registros novos, então o custo de uma gravação é o da mudança
+    e não o do índice inteiro. Escritores de processos diferentes se
+    coordenam por uma trava de arquivo. Leitores seguem o log a partir do
+    deslocamento já aplicado e só recarregam tudo quando uma compactação
+    troca os arquivos.
+
+    Os registros precisam ser do tipo upsert/remoção: reaplicar um trecho do
+    log sobre um snapshot mais novo chega ao mesmo estado.
+
+    Args:
+        path: Arquivo do snapshot; o log fica em `{path}.log`
+        compact_ratio: Compacta quando o log passa desta fração do snapshot
+        min_compact_bytes: Tamanho de log abaixo do qual nunca compacta
+    """
+
+    def __init__(self, path, compact_ratio=1.0, min_compact_bytes=4 << 20):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        # Serializa as operações de arquivo das threads do processo
+        self.lock = threading.Lock()
+        self.offset = 0
+        self.inode = None
+        self.snapshot_mtime = None
+
+    @property
+    def directory(self):
+        return os.path.dirname(os.path.abspath(self.path))
+
+    @contextmanager
+    def writing(self):
+        """Trava exclusiva entre processos para acrescentar ao log ou compactar"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def status(self):
+        """
+        Returns:
+            "reload" se o snapshot ou o log foram trocados, "tail" se o log
+            cresceu além do já aplicado, None se nada mudou
+        """
+        try:
+            snapshot_mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            snapshot_mtime = None
+        try:
+            log_stat = os.stat(self.log_path)
+        except OSError:
+            log_stat = None
+
+        if snapshot_mtime != self.snapshot_mtime:
+            return "reload"
+        if log_stat is None:
+            return "reload" if self.inode is not None else None
+        if log_stat.st_ino != self.inode:
+            return "reload"
+        if log_stat.st_size > self.offset:
+            return "tail"
+        return None
+
+    def load(self, read_snapshot):
+        """
+        Lê o snapshot e o log inteiro
+
+        O log é aberto antes do snapshot: como a compactação troca o snapshot
+        antes do log, o pior caso é reaplicar registros já contidos nele.
+
+        Returns:
+            (estado lido por `read_snapshot` ou None, registros do log)
+        """
+        log_file = self._open_log()
+        try:
+            try:
+                self.snapshot_mtime = os.stat(self.path).st_mtime_ns
+                state = read_snapshot(self.path)
+            except FileNotFoundError:
+                self.snapshot_mtime, state = None, None
+            if log_file is None:
+                self.inode, self.offset = None, 0
+                return state, []
+            self.inode = os.fstat(log_file.fileno()).st_ino
+            self.offset = 0
+            return state, self._read_records(log_file)
+        finally:
+            if log_file is not None:
+                log_file.close()
+
+    def read_tail(self):
+        """Registros acrescentados ao log desde a última leitura"""
+        log_file = self._open_log()
+        if log_file is None:
+            return []
+        with log_file:
+            if os.fstat(log_file.fileno()).st_ino != self.inode:
+                return []
+            log_file.seek(self.offset)
+            return self._read_records(log_file)
+
+    def append(self, records):
+        """Acrescenta registros ao log (chamar dentro de `writing`, com o estado em dia)"""
+        if not records:
+            return
+        data = b"".join(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL) for record in records)
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            log_stat = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if self.inode is None:
+            self.inode = log_stat.st_ino
+        self.offset = log_stat.st_size
+
+    def should_compact(self):
+        try:
+            log_size = os.path.getsize(self.log_path)
+        except OSError:
+            return False
+        try:
+            snapshot_size = os.path.getsize(self.path)
+        except OSError:
+            snapshot_size = 0
+        return log_size > max(self.min_compact_bytes, self.compact_ratio * snapshot_size)
+
+    def compact(self, write_snapshot, binary=True):
+        """
+        Regrava o snapshot com `write_snapshot(arquivo)` e começa um log vazio
+        (chamar dentro de `writing`, com o estado em dia)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._replace(self.path, write_snapshot, binary)
+        self._replace(self.log_path, lambda f: None, True)
+        self.snapshot_mtime = os.stat(self.path).st_mtime_ns
+        self.inode = os.stat(self.log_path).st_ino
+        self.offset = 0
+
+    def _replace(self, path, write, binary):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{os.path.basename(path)}.")
+        try:
+            with open(fd, "wb" if binary else "w", **({} if binary else {"encoding": "utf-8"})) as f:
+                write(f)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _open_log(self):
+        try:
+            return open(self.log_path, "rb")
+        except FileNotFoundError:
+            return None
+
+    def _read_records(self, log_file):
+        """Lê registros completos a partir da posição atual; um registro ainda incompleto fica para depois"""
+        start = log_file.tell()
+        buffer = io.BytesIO(log_file.read())
+        records = []
+        consumed = 0
+        while True:
+            try:
+                records.append(pickle.load(buffer))
+            except (EOFError, pickle.UnpicklingError, ValueError, AttributeError, IndexError):
+                break
+            consumed = buffer.tell()
+        self.offset = start + consumed
+        return records
+
+
+class LoggedIndex:
+    """
+    Base dos índices em memória persistidos com um DeltaLog
+
+    Implementa o protocolo comum: as alterações viram registros aplicados na
+    memória e guardados em `_pending` até o `save`, que os acrescenta ao log
+    (ou compacta); os outros processos aplicam o log em segundo plano. As
+    subclasses só implementam os ganchos:
+
+    - `_apply(record)`: aplica um registro ao estado em memória (um registro
+      `("clear",)` deve esvaziar o índice)
+    - `_write_snapshot(f)`: grava o estado completo no arquivo aberto
+    - `_read_snapshot(path)`: monta um índice novo (sem `path`) a partir do
+      snapshot em disco
+    - `_swap(fresh)`: troca o estado pelo de `fresh` (chamado com `_lock`)
+
+    Subclasses com snapshot em texto definem `snapshot_binary = False`, e
+    chamam `_load()` ao fim do próprio `__init__`.
+    """
+
+    snapshot_binary = True
+
+    def __init__(self, path=None, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self._pending = []       # registros ainda não gravados no log
+        self._log = DeltaLog(path) if path else None
+        self._last_reload_check = 0.0
+
+    @property
+    def dirty(self):
+        return bool(self._pending)
+
+    def _record(self, record):
+        """Aplica um registro e o guarda para o próximo save (chamar com `_lock`)"""
+        self._apply(record)
+        self._pending.append(record)
+
+    def save(self):
+        """
+        Grava as alterações pendentes no log
+
+        Antes, aplica o que outros processos gravaram e reaplica as alterações
+        pendentes por cima, para que a memória siga a ordem do log. Um `clear`
+        ou um log maior que o snapshot regrava o snapshot (compactação).
+        """
+        if self._log is None:
+            self._pending = []
+            return
+        with self._log.lock:
+            with self._lock:
+                records = self._pending
+            if not records:
+                return
+            with self._log.writing():
+                status = self._log.status()
+                if status == "reload":
+                    self._swap_locked(self._read())
+                elif status == "tail":
+                    self._apply_all(self._log.read_tail())
+                with self._lock:
+                    if status is not None:
+                        # Inclui as alterações que outras threads fizeram depois da cópia de `records`
+                        for record in self._pending:
+                            self._apply(record)
+                    cleared = any(record[0] == "clear" for record in records)
+                    if not cleared:
+                        self._log.append(records)
+                    if cleared or self._log.should_compact():
+                        self._log.compact(self._write_snapshot, self.snapshot_binary)
+                    # Alterações feitas por outras threads durante a gravação ficam para o próximo save
+                    self._pending = self._pending[len(records):]
+
+    def _read(self):
+        """Monta, fora da trava das buscas, um índice com o snapshot e o log do disco"""
+        fresh, records = self._log.load(self._read_snapshot)
+        if fresh is None:
+            fresh = type(self)()
+        for record in records:
+            fresh._apply(record)
+        return fresh
+
+    def _swap_locked(self, fresh):
+        with self._lock:
+            self._swap(fresh)
+
+    def _apply_all(self, records):
+        with self._lock:
+            for record in records:
+                self._apply(record)
+
+    def _load(self):
+        if self._log is None:
+            return
+        with self._log.lock:
+            self._swap_locked(self._read())
+
+    def _maybe_reload(self):
+        """
+        Aplica o que outros processos (ex.: a ingestão) gravaram
+
+        A conferência roda em uma thread de segundo plano (uma por vez) e as
+        buscas seguem no estado atual enquanto isso. A leitura dos arquivos
+        acontece fora da trava das buscas, que só é tomada para trocar o
+        índice ou aplicar o log novo.
+        """
+        if self._log is None or self.dirty:
+            return
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+        if not self._log.lock.acquire(blocking=False):
+            return
+        threading.Thread(target=self._reload, daemon=True, name="index-reload").start()
+
+    def _reload(self):
+        """Roda em segundo plano, com a trava de arquivos já tomada por _maybe_reload"""
+        try:
+            status = self._log.status()
+            if status == "reload":
+                self._swap_locked(self._read())
+            elif status == "tail":
+                self._apply_all(self._log.read_tail())
+        except Exception as e:
+            print(f"Erro ao recarregar o índice {self.path}: {e}")
+        finally:
+            self._log.lock.release()
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+# Limite de parâmetros por consulta do SQLite
+_SQLITE_BATCH = 500
+
+
+def normalize_text(text):
+    """Normaliza o texto antes do hash (Unicode NFC e espaços colapsados)"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """
+    Cache persistente de embeddings em SQLite
+
+    A chave é o hash do nome do modelo com o texto normalizado e o valor é o
+    vetor float32. O tamanho é limitado por max_entries, removendo as entradas
+    acessadas há mais tempo (LRU). O modo WAL permite que o backend e a
+    ingestão usem o mesmo arquivo ao mesmo tempo.
+    """
+
+    def __init__(self, path, max_entries=200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._inherited_conns = []
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def reopen(self):
+        """Abre uma nova conexão no processo atual (conexões SQLite não podem cruzar um fork)"""
+        with self._lock:
+            # A conexão herdada não é fechada: fechá-la no filho poderia afetar o WAL do pai
+            self._inherited_conns.append(self._conn)
+            self._connect()
+
+    @staticmethod
+    def make_key(model_name, text):
+        return hashlib.sha256(f"{model_name}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Retorna um dicionário chave -> vetor com as chaves encontradas"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), _SQLITE_BATCH):
+                batch = unique_keys[start:start + _SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """Grava uma lista de tuplas (chave, vetor)"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove as entradas menos usadas, deixando 10% de folga abaixo do limite"""
+        excess = self._count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (excess,)
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self):
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class CachedEncoder:
+    """
+    Encoder que consulta o cache antes de chamar o modelo
+
+    Apenas os textos ausentes do cache são enviados ao modelo, em um único
+    lote; os vetores novos são gravados no cache em seguida. Com `loader`, o
+    modelo só é carregado na primeira vez em que um texto não está no cache.
+    """
+
+    def __init__(self, model, model_name, cache=None, loader=None):
+        self._model = model
+        self._loader = loader
+        self._load_lock = threading.Lock()
+        self.model_name = model_name
+        self.cache = cache
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._loader()
+        return self._model
+
+    def encode(self, texts, batch_size=32):
+        """Mesma interface de SentenceTransformer.encode para str ou lista de str"""
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size=batch_size)[0]
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        if self.cache is None:
+            return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Textos repetidos no mesmo lote são codificados uma única vez
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = np.asarray(
+                self.model.encode(list(missing.values()), batch_size=batch_size), dtype=np.float32
+            )
+            new_items = list(zip(missing.keys(), vectors))
+            self.cache.put_many(new_items)
+            cached.update(new_items)
+
+        return np.stack([cached[key] for key in keys])
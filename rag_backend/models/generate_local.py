@@ -1,9 +1,24 @@
 import os
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
-from sentence_transformers import SentenceTransformer
+import queue
+import threading
 import json
 import re
+import time
+from .batch_generator import BatchGenerator
+from .context_builder import ContextBuilder, LLM_PROMPT_TOKENS, hits_from_documents
+from .metrics import span, observe_generation
+from .inference_backend import LLM_BACKEND, backend_device, load_causal_lm
+
+# Modelo de geração
+LLM_MODEL_NAME = os.getenv("LLM_MODEL", "microsoft/DialoGPT-medium")
+
+# Batching dinâmico da geração
+LLM_BATCHING_ENABLED = os.getenv("LLM_BATCHING_ENABLED", "1") == "1"
+LLM_MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", "8"))
+LLM_MAX_WAIT_MS = float(os.getenv("LLM_MAX_WAIT_MS", "20"))
+
+# Espera máxima por um trecho da geração em streaming antes de desistir
+LLM_STREAM_TIMEOUT_S = float(os.getenv("LLM_STREAM_TIMEOUT_S", "60"))
 
 class LocalLLMClient:
     _instance = None
@@ -11,46 +26,66 @@ class LocalLLMClient:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(LocalLLMClient, cls).__new__(cls)
-            # Usando modelo gratuito e leve
-            cls._instance.tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
-            cls._instance.model = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-medium")
-            
-            # Configurar para usar CPU se GPU não estiver disponível
-            cls._instance.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            cls._instance.model.to(cls._instance.device)
+            # O modelo só é carregado em load() (no primeiro uso ou no warmup do
+            # backend), então criar o cliente não importa torch nem transformers
+            cls._instance.loaded = False
+            cls._instance._load_lock = threading.Lock()
             
         return cls._instance
 
-    def generate_response(self, prompt, max_new_tokens=150):
-        """Gera resposta usando modelo local"""
-        try:
+    def load(self):
+        """Carrega tokenizer e modelo; chamadas seguintes não fazem nada"""
+        if self.loaded:
+            return self
+        
+        with self._load_lock:
+            if self.loaded:
+                return self
+            
+            from transformers import AutoTokenizer
+            
+            # Usando modelo gratuito e leve, no backend configurado (pytorch, quantized ou onnx)
+            self.tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL_NAME)
+            self.model = load_causal_lm(LLM_MODEL_NAME, LLM_BACKEND)
+            
             # Configurar tokenizer para evitar warnings
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
             
-            # Codificar com attention mask
-            inputs = self.tokenizer(
-                prompt, 
-                return_tensors="pt", 
-                padding=True, 
-                truncation=True,
-                max_length=512  # Limitar entrada para evitar problemas
-            ).to(self.device)
+            # Configurar para usar CPU se GPU não estiver disponível
+            self.device = backend_device(LLM_BACKEND)
+            self.model.to(self.device)
             
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    input_ids=inputs['input_ids'],
-                    attention_mask=inputs['attention_mask'],
-                    max_new_tokens=max_new_tokens,
-                    num_return_sequences=1,
-                    temperature=0.7,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    eos_token_id=self.tokenizer.eos_token_id
-                )
+            # Worker que agrupa prompts concorrentes em uma única chamada ao modelo
+            self.generator = BatchGenerator(
+                self.model,
+                self.tokenizer,
+                self.device,
+                max_batch_size=LLM_MAX_BATCH_SIZE,
+                max_wait_ms=LLM_MAX_WAIT_MS,
+                enabled=LLM_BATCHING_ENABLED,
+                generate_kwargs={"temperature": 0.7, "do_sample": True}
+            )
+            self.loaded = True
+        
+        return self
+
+    def generate_response(self, prompt, max_new_tokens=150, input_ids=None):
+        """Gera resposta usando modelo local (input_ids: prompt já tokenizado)"""
+        try:
+            self.load()
             
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            return response[len(prompt):].strip()
+            if input_ids is None:
+                # Limitar entrada para evitar problemas
+                input_ids = self.tokenizer(prompt, truncation=True, max_length=LLM_PROMPT_TOKENS)["input_ids"]
+            
+            # O worker agrupa este prompt com outros que chegarem ao mesmo tempo
+            start = time.perf_counter()
+            with span("generate_response"):
+                future = self.generator.submit(input_ids, max_new_tokens=max_new_tokens)
+                response = future.result()
+            observe_generation(getattr(future, "generated_tokens", 0), time.perf_counter() - start)
+            return response.strip()
             
         except Exception as e:
             print(f"Erro na geração: {e}")
@@ -91,44 +126,116 @@ class LocalLLMClient:
         
         return " ".join(keywords[:5])  # Retorna até 5 palavras-chave
 
-    def generate_answer(self, retrieved_docs, query):
-        """Gera resposta baseada nos documentos recuperados"""
-        if not retrieved_docs:
-            return json.dumps({"Erro": "Nenhum documento encontrado"})
-        
-        # Construir contexto (limitando tamanho para evitar problemas)
-        context_parts = []
-        for doc_name, content in retrieved_docs.items():
-            # Limitar conteúdo de cada documento
-            limited_content = content[:300] + "..." if len(content) > 300 else content
-            context_parts.append(f"{doc_name}: {limited_content}")
-        
-        context = "\n\n".join(context_parts)
-        
-        # Prompt para o modelo local (limitando tamanho total)
-        prompt = f"""
-        Com base nos seguintes documentos, responda à pergunta do usuário.
+    def build_answer_prompt(self, retrieved_docs, query, hits=None, max_new_tokens=300):
+        """
+        Monta o prompt de resposta a partir dos documentos recuperados
+
+        Com `hits` (resultado da busca), os trechos entram por score e sem a
+        sobreposição entre chunks vizinhos; sem eles, cada artigo do
+        dicionário é um trecho, na ordem do dicionário. O prompt cabe no
+        orçamento de tokens, descontado o espaço da resposta no contexto do modelo.
+
+        Returns:
+            (prompt, input_ids)
+        """
+        self.load()
+        tokenizer = getattr(self, "tokenizer", None)
+        budget = LLM_PROMPT_TOKENS
+        model_max_length = getattr(tokenizer, "model_max_length", None)
+        if model_max_length and model_max_length < 1_000_000:
+            budget = min(budget, model_max_length - max_new_tokens)
         
-        Documentos:
-        {context}
+        if hits is None:
+            hits = hits_from_documents(retrieved_docs)
+        prompt, input_ids, used = ContextBuilder(tokenizer, budget).build(hits, query)
+        print(f"Contexto: {used}/{len(hits)} trechos, {len(input_ids)}/{budget} tokens")
+        return prompt, input_ids
+
+    def stream_response(self, prompt, max_new_tokens=150, input_ids=None):
+        """
+        Gera resposta token a token
+
+        A geração roda em uma thread separada e os trechos de texto são
+        entregues pelo TextIteratorStreamer assim que cada token é decodificado.
+        Não entra nos lotes do worker de batching, que só devolve o texto
+        completo, mas usa a mesma trava do modelo: enquanto gera, os lotes
+        esperam (e vice-versa).
+
+        Raises:
+            RuntimeError: Se a geração falhar (o erro original fica em __cause__)
+            TimeoutError: Se nenhum trecho chegar em LLM_STREAM_TIMEOUT_S
+        """
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
         
-        Pergunta: {query}
+        self.load()
+        if input_ids is None:
+            inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=LLM_PROMPT_TOKENS).to(self.device)
+        else:
+            ids = torch.tensor([input_ids], device=self.device)
+            inputs = {"input_ids": ids, "attention_mask": torch.ones_like(ids)}
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=LLM_STREAM_TIMEOUT_S
+        )
+        # Interrompe a geração quando o consumidor desiste (prazo ou cliente desconectado)
+        cancelled = threading.Event()
+        errors = []
+
+        class StopWhenCancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancelled.is_set()
         
-        Resposta:"""
+        def run():
+            start = time.perf_counter()
+            try:
+                outputs = self.generator.generate(
+                    input_ids=inputs['input_ids'],
+                    attention_mask=inputs['attention_mask'],
+                    max_new_tokens=max_new_tokens,
+                    temperature=0.7,
+                    do_sample=True,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    eos_token_id=self.tokenizer.eos_token_id,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StopWhenCancelled()])
+                )
+                observe_generation(outputs.shape[1] - inputs['input_ids'].shape[1], time.perf_counter() - start)
+            except Exception as e:
+                # Sem o fim do stream, o consumidor esperaria o próximo trecho para sempre
+                errors.append(e)
+                streamer.end()
         
-        # Verificar se o prompt não é muito longo
-        if len(prompt) > 1000:
-            # Se for muito longo, simplificar
-            prompt = f"""
-            Pergunta: {query}
-            
-            Documentos encontrados: {', '.join(retrieved_docs.keys())}
-            
-            Resposta:"""
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        except queue.Empty:
+            raise TimeoutError(f"Nenhum trecho gerado em {LLM_STREAM_TIMEOUT_S:g}s")
+        finally:
+            cancelled.set()
+        thread.join()
+        if errors:
+            raise RuntimeError(f"Erro na geração: {errors[0]}") from errors[0]
+
+    def stream_answer(self, retrieved_docs, query, max_new_tokens=300, hits=None):
+        """Gera a resposta baseada nos documentos recuperados em streaming"""
+        with span("build_prompt"):
+            prompt, input_ids = self.build_answer_prompt(retrieved_docs, query, hits, max_new_tokens)
+        yield from self.stream_response(prompt, max_new_tokens=max_new_tokens, input_ids=input_ids)
+
+    def generate_answer(self, retrieved_docs, query, hits=None):
+        """Gera resposta baseada nos documentos recuperados (hits: resultado da busca, com scores)"""
+        if not retrieved_docs:
+            return json.dumps({"Erro": "Nenhum documento encontrado"})
         
         try:
+            with span("build_prompt"):
+                prompt, input_ids = self.build_answer_prompt(retrieved_docs, query, hits, max_new_tokens=300)
+            
             # Gerar resposta
-            response = self.generate_response(prompt, max_new_tokens=300)
+            response = self.generate_response(prompt, max_new_tokens=300, input_ids=input_ids)
             
             # Verificar se a resposta é válida
             if not response or response == "Desculpe, não consegui gerar uma resposta adequada.":
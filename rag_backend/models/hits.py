@@ -0,0 +1,58 @@
+class Hit:
+    """
+    Um documento encontrado por uma busca
+
+    `score` é sempre "maior é melhor": similaridade de cosseno na busca
+    semântica, BM25 na léxica e o valor da Reciprocal Rank Fusion depois da
+    fusão. Os mesmos objetos passam pela busca, fusão e montagem do prompt;
+    o dicionário artigo -> texto da API só é montado em format_hits.
+    """
+
+    __slots__ = ("id", "score", "document", "metadata")
+
+    def __init__(self, id, score, document, metadata=None):
+        self.id = id
+        self.score = score
+        self.document = document or ""
+        self.metadata = metadata or {}
+
+    @property
+    def article_name(self):
+        return self.metadata.get("article_name", "Unknown Article")
+
+    @property
+    def chunk_index(self):
+        return self.metadata.get("chunk_index")
+
+    @property
+    def url(self):
+        return self.metadata.get("url", "")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "score": self.score,
+            "article_name": self.article_name,
+            "chunk_index": self.chunk_index,
+            "url": self.url,
+            "content": self.document
+        }
+
+    def __repr__(self):
+        return f"Hit({self.id!r}, score={self.score:.4f}, article={self.article_name!r})"
+
+
+def hits_from_query(ids, documents, metadatas, distances):
+    """Hits de uma consulta vetorial (distância de cosseno -> similaridade)"""
+    return [
+        Hit(doc_id, 1.0 - distance, document, metadata)
+        for doc_id, document, metadata, distance in zip(ids, documents, metadatas, distances)
+    ]
+
+
+def format_hits(hits):
+    """Formata os hits no dicionário artigo -> texto concatenado usado pela API"""
+    grouped = {}
+    for hit in hits:
+        grouped.setdefault(hit.article_name, []).append(hit.document)
+    return {name: "".join(f"{document} " for document in documents) for name, documents in grouped.items()}
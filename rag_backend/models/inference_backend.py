@@ -0,0 +1,102 @@
+import os
+
+# Backends de inferência disponíveis:
+#   pytorch   - modelo original em fp32
+#   quantized - quantização dinâmica int8 das camadas lineares (CPU)
+#   onnx      - exportação para ONNX Runtime (requer optimum[onnxruntime])
+BACKENDS = ("pytorch", "quantized", "onnx")
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+LLM_BACKEND = os.getenv("LLM_INFERENCE_BACKEND", INFERENCE_BACKEND)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_INFERENCE_BACKEND", INFERENCE_BACKEND)
+
+# Diretório onde os modelos exportados para ONNX ficam salvos entre execuções
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR", "./onnx_models")
+
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de inferência inválido: {backend}. Opções: {', '.join(BACKENDS)}")
+
+
+def backend_device(backend):
+    """Dispositivo usado por um backend; quantizado e ONNX rodam apenas em CPU"""
+    import torch
+
+    if backend == "pytorch" and torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
+
+
+def _conv1d_to_linear(module):
+    """
+    Converte as camadas Conv1D do GPT-2 em nn.Linear equivalentes
+
+    O DialoGPT (GPT-2) implementa as projeções com Conv1D, que a quantização
+    dinâmica do PyTorch ignora. Conv1D guarda o peso como (entrada, saída),
+    então basta transpor para obter a nn.Linear.
+    """
+    from torch import nn
+    from transformers.pytorch_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+    return module
+
+
+def quantize_dynamic_int8(model):
+    """Aplica quantização dinâmica int8 às camadas lineares do modelo"""
+    import torch
+    from torch import nn
+
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_export_path(model_name):
+    return os.path.join(ONNX_EXPORT_DIR, model_name.replace("/", "__"))
+
+
+def load_causal_lm(model_name, backend=LLM_BACKEND):
+    """Carrega o modelo de geração no backend escolhido"""
+    _check_backend(backend)
+
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForCausalLM
+
+        export_path = _onnx_export_path(model_name)
+        if os.path.isdir(export_path):
+            return ORTModelForCausalLM.from_pretrained(export_path)
+        model = ORTModelForCausalLM.from_pretrained(model_name, export=True)
+        model.save_pretrained(export_path)
+        return model
+
+    from transformers import AutoModelForCausalLM
+
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    if backend == "quantized":
+        model = quantize_dynamic_int8(_conv1d_to_linear(model))
+    return model.eval()
+
+
+def load_sentence_transformer(model_name, backend=EMBEDDING_BACKEND):
+    """Carrega o modelo de embeddings no backend escolhido"""
+    _check_backend(backend)
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        # Suporte nativo a ONNX Runtime do sentence-transformers (>= 3.2)
+        return SentenceTransformer(model_name, backend="onnx", device="cpu")
+
+    if backend == "quantized":
+        model = SentenceTransformer(model_name, device="cpu")
+        return quantize_dynamic_int8(model)
+
+    return SentenceTransformer(model_name)
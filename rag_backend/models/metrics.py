@@ -0,0 +1,100 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+# Com vários workers (gunicorn), defina PROMETHEUS_MULTIPROC_DIR para que /metrics agregue todos
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "academia_stage_duration_seconds",
+    "Duração de cada etapa da busca, da geração e da indexação",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "academia_request_duration_seconds",
+    "Duração das requisições HTTP",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS
+)
+GENERATED_TOKENS = Counter(
+    "academia_generated_tokens_total",
+    "Tokens gerados pelo LLM"
+)
+GENERATION_TOKENS_PER_SECOND = Histogram(
+    "academia_generation_tokens_per_second",
+    "Velocidade de geração por resposta",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+INDEXED_DOCUMENTS = Counter(
+    "academia_indexed_documents_total",
+    "Documentos indexados no ChromaDB",
+    ["index"]
+)
+
+# Tempos da requisição atual, para o detalhamento opcional na resposta. Um
+# ContextVar (e não um threading.local) para que as sub-consultas submetidas
+# com contextvars.copy_context().run registrem no detalhamento da requisição
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+# As sub-consultas de uma requisição registram em paralelo no mesmo dicionário
+_timings_lock = threading.Lock()
+
+
+def _record(key, value):
+    timings = _request_timings.get()
+    if timings is not None:
+        with _timings_lock:
+            timings[key] = timings.get(key, 0) + value
+
+
+@contextmanager
+def span(stage):
+    """Mede uma etapa: alimenta o histograma e o detalhamento da requisição atual"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        _record(stage, elapsed * 1000)
+
+
+def start_request_timing():
+    _request_timings.set({})
+
+
+def finish_request_timing():
+    """
+    Retorna os tempos (ms) das etapas medidas na requisição atual
+
+    Etapas que rodam em paralelo (uma sub-consulta por shard/índice) somam
+    seus tempos, então o total pode passar do tempo de parede da requisição.
+    """
+    timings = _request_timings.get() or {}
+    _request_timings.set(None)
+    with _timings_lock:
+        return {stage: round(ms, 2) for stage, ms in timings.items()}
+
+
+def observe_generation(tokens, seconds):
+    GENERATED_TOKENS.inc(tokens)
+    if seconds > 0 and tokens:
+        GENERATION_TOKENS_PER_SECOND.observe(tokens / seconds)
+    _record("generated_tokens", tokens)
+
+
+def render_metrics():
+    """Retorna (corpo, content type) no formato de exposição do Prometheus"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+import time
+
+from .lru_cache import LRUCache
+from .metrics import span
+
+# Segundo estágio da busca: cross-encoder reordena os melhores candidatos
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))    # N buscados no primeiro estágio
+RERANK_TOP_M = int(os.getenv("RERANK_TOP_M", "20"))              # máximo reordenado pelo cross-encoder
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))   # tempo alvo do cross-encoder por busca
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+
+
+class CrossEncoderReranker:
+    """
+    Reordena hits com um cross-encoder pequeno na CPU
+
+    Só os M primeiros candidatos passam pelo modelo, em lotes. M começa em
+    `top_m` e é limitado pelo orçamento de tempo: o custo por par é medido a
+    cada lote (média móvel) e só os pares fora do cache contam. Os scores
+    ficam em um LRU por (hash da query, ID do chunk, hash do conteúdo), então
+    queries repetidas não voltam ao modelo.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, top_m=RERANK_TOP_M, budget_ms=RERANK_BUDGET_MS,
+                 batch_size=RERANK_BATCH_SIZE, cache_size=RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.top_m = top_m
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache = LRUCache(maxsize=cache_size)
+        self.ms_per_pair = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Cross-encoder (carregado no primeiro acesso)"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        return self.model
+
+    def rerank(self, query, hits, k):
+        """
+        Reordena os candidatos e retorna os k melhores
+
+        Os hits reordenados recebem o score do cross-encoder; candidatos além
+        de M não são retornados (M nunca é menor que k).
+        """
+        if not hits:
+            return hits
+
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+        keys = [(query_hash, hit.id, hit.metadata.get("content_hash")) for hit in hits]
+        scores = [self.cache.get(key) for key in keys]
+
+        # Pares fora do cache permitidos pelo orçamento; os do cache são de graça
+        allowed = len(hits)
+        if self.ms_per_pair:
+            allowed = max(k, int(self.budget_ms / self.ms_per_pair))
+        limit = min(len(hits), max(k, self.top_m))
+        candidates, pending = [], []
+        for position in range(limit):
+            if scores[position] is None:
+                if len(pending) >= allowed:
+                    continue
+                pending.append(position)
+            candidates.append(position)
+
+        if pending:
+            with span("rerank"):
+                self._score(query, hits, keys, scores, pending, min_scored=k - (len(candidates) - len(pending)))
+
+        # Pendentes que o orçamento cortou ficam de fora
+        candidates = [position for position in candidates if scores[position] is not None]
+        ranked = sorted(candidates, key=lambda position: scores[position], reverse=True)[:k]
+        for position in ranked:
+            hits[position].score = scores[position]
+        return [hits[position] for position in ranked]
+
+    def _score(self, query, hits, keys, scores, pending, min_scored):
+        """
+        Pontua os pares pendentes em lotes, atualizando o custo medido por par
+
+        Para quando o orçamento estoura, desde que `min_scored` pares já tenham score.
+        """
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        for start in range(0, len(pending), self.batch_size):
+            if start >= min_scored and time.perf_counter() > deadline:
+                break
+            batch = pending[start:start + self.batch_size]
+            began = time.perf_counter()
+            predicted = self.model.predict(
+                [(query, hits[position].document) for position in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            elapsed_ms = (time.perf_counter() - began) * 1000
+            per_pair = elapsed_ms / len(batch)
+            self.ms_per_pair = per_pair if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * per_pair
+
+            for position, score in zip(batch, predicted):
+                scores[position] = float(score)
+                self.cache.put(keys[position], float(score))
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "top_m": self.top_m,
+            "budget_ms": self.budget_ms,
+            "ms_per_pair": round(self.ms_per_pair, 3) if self.ms_per_pair else None,
+            "cache": self.cache.stats()
+        }
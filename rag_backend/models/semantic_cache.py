@@ -0,0 +1,151 @@
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticCacheEntry:
+    """Resultado guardado para uma query: documentos, hits e, depois da geração, a resposta"""
+
+    __slots__ = ("query", "retrieved_docs", "hits", "answer", "expires_at")
+
+    def __init__(self, query, retrieved_docs, hits, expires_at):
+        self.query = query
+        self.retrieved_docs = retrieved_docs
+        self.hits = hits
+        self.answer = None
+        self.expires_at = expires_at
+
+
+class SemanticQueryCache:
+    """
+    Cache de queries por similaridade de embedding
+
+    Paráfrases ("IA na educação" / "inteligência artificial educação") caem
+    na mesma entrada quando o cosseno entre os embeddings passa do limiar.
+    Os vetores ficam em uma matriz pré-alocada; a busca é um produto matriz-
+    vetor restrito às entradas do mesmo escopo (tipo de busca, índices, etc.).
+    Quando cheio, a entrada usada há mais tempo é substituída. Uma mudança
+    na versão dos dados descarta tudo.
+
+    Args:
+        maxsize: Número máximo de entradas
+        threshold: Similaridade de cosseno mínima para reaproveitar uma entrada
+        ttl: Tempo de vida das entradas em segundos (None = sem expiração)
+    """
+
+    def __init__(self, maxsize=1024, threshold=0.92, ttl=None):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._vectors = None                               # alocada no primeiro put (dimensão do modelo)
+        self._scopes = np.full(maxsize, -1, dtype=np.int64)  # -1 = posição livre
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._entries = [None] * maxsize
+        self._scope_ids = {}
+        self._clock = 0
+        self._version = None
+
+    def get(self, embedding, scope, version=None):
+        """
+        Returns:
+            (entrada, similaridade) da query mais parecida acima do limiar, ou (None, similaridade)
+        """
+        with self._lock:
+            self._check_version(version)
+            scope_id = self._scope_ids.get(scope)
+            if self._vectors is None or scope_id is None or self.maxsize <= 0:
+                self.misses += 1
+                return None, None
+
+            similarities = self._vectors @ self._normalize(embedding)
+            similarities[self._scopes != scope_id] = -np.inf
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            entry = self._entries[slot]
+
+            if similarity < self.threshold or entry is None:
+                self.misses += 1
+                return None, similarity if np.isfinite(similarity) else None
+            if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._free(slot)
+                self.misses += 1
+                return None, similarity
+
+            self._clock += 1
+            self._last_used[slot] = self._clock
+            self.hits += 1
+            return entry, similarity
+
+    def put(self, embedding, scope, query, retrieved_docs, hits, version=None):
+        """Guarda o resultado de uma query e retorna a entrada (para anexar a resposta depois)"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        entry = SemanticCacheEntry(query, retrieved_docs, hits, expires_at)
+        if self.maxsize <= 0:
+            return entry
+
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+
+            free = np.flatnonzero(self._scopes < 0)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+
+            self._clock += 1
+            self._vectors[slot] = vector
+            self._scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            self._last_used[slot] = self._clock
+            self._entries[slot] = entry
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._scopes[:] = -1
+        self._last_used[:] = 0
+        self._entries = [None] * self.maxsize
+        self._scope_ids = {}
+
+    def _free(self, slot):
+        self._scopes[slot] = -1
+        self._last_used[slot] = 0
+        self._entries[slot] = None
+
+    def _check_version(self, version):
+        """Descarta as entradas se os dados mudaram desde que foram guardadas"""
+        if version is None or version == self._version:
+            return
+        if self._version is not None:
+            self._clear()
+            self.invalidations += 1
+        self._version = version
+
+    def _normalize(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __len__(self):
+        return int(np.count_nonzero(self._scopes >= 0))
+
+    def stats(self):
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,62 @@
+import bisect
+import zlib
+
+
+class ShardRouter:
+    """
+    Distribui os documentos de um índice entre várias coleções (shards)
+
+    Com a chave "hash", o shard vem do CRC32 do ID do documento, então
+    escritas, remoções e leituras por ID vão direto ao shard certo. Com a
+    chave "year", o shard é a faixa de `publication_year` definida pelos
+    limites em `year_bounds` (documentos sem ano ficam no primeiro); como o
+    ano não se deduz do ID, operações por ID consultam todos os shards, mas
+    buscas restritas a uma faixa de anos só consultam os shards dela.
+
+    Com um único shard, a coleção mantém o nome do índice (sem sharding).
+
+    Args:
+        index_name: Índice particionado
+        shards: Número de shards na chave "hash"
+        key: "hash" ou "year"
+        year_bounds: Primeiro ano de cada faixa após a primeira (chave "year")
+    """
+
+    def __init__(self, index_name, shards=1, key="hash", year_bounds=()):
+        if key not in ("hash", "year"):
+            raise ValueError(f"Chave de shard desconhecida: {key}")
+        self.index_name = index_name
+        self.key = key
+        self.year_bounds = sorted(year_bounds)
+        count = len(self.year_bounds) + 1 if key == "year" else max(shards, 1)
+        self.names = [index_name] if count == 1 else [f"{index_name}_s{n}" for n in range(count)]
+
+    def route(self, doc_id, metadata=None):
+        """Shard que guarda o documento"""
+        if len(self.names) == 1:
+            return self.names[0]
+        if self.key == "year":
+            year = (metadata or {}).get("publication_year")
+            try:
+                return self.names[bisect.bisect_right(self.year_bounds, int(year))]
+            except (TypeError, ValueError):
+                return self.names[0]
+        return self.names[zlib.crc32(str(doc_id).encode("utf-8")) % len(self.names)]
+
+    def names_for_years(self, year_range=None):
+        """Shards que podem guardar documentos da faixa (inicio, fim) de anos; None nos limites = aberto"""
+        if year_range is None or self.key != "year" or len(self.names) == 1:
+            return list(self.names)
+        start, end = year_range
+        first = bisect.bisect_right(self.year_bounds, start) if start is not None else 0
+        last = bisect.bisect_right(self.year_bounds, end) if end is not None else len(self.names) - 1
+        return self.names[first:last + 1]
+
+    def route_ids(self, ids):
+        """Agrupa IDs por shard: {shard: [ids]} (todos os shards quando a chave não vem do ID)"""
+        if len(self.names) == 1 or self.key == "year":
+            return {name: list(ids) for name in self.names}
+        grouped = {}
+        for doc_id in ids:
+            grouped.setdefault(self.route(doc_id), []).append(doc_id)
+        return grouped
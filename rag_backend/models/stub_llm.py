@@ -0,0 +1,57 @@
+import hashlib
+import os
+import time
+
+from .generate_local import LocalLLMClient
+from .metrics import span, observe_generation
+
+# Latência simulada: fixa por chamada + por token gerado
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "50"))
+STUB_LLM_MS_PER_TOKEN = float(os.getenv("STUB_LLM_MS_PER_TOKEN", "0"))
+STUB_LLM_TOKENS = int(os.getenv("STUB_LLM_TOKENS", "40"))
+
+_STUB_WORDS = (
+    "os documentos indicam que a pesquisa apresenta resultados relevantes sobre o tema "
+    "com base em dados e métodos descritos nos artigos encontrados"
+).split()
+
+
+class StubLLMClient(LocalLLMClient):
+    """
+    Substituto determinístico do LocalLLMClient para testes de carga
+
+    Não carrega modelo: a "geração" espera a latência configurada e devolve
+    um texto derivado do hash do prompt. Orquestração, palavras-chave e
+    montagem do prompt e da resposta são as do cliente real, então o
+    restante do pipeline é exercitado normalmente.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = object.__new__(cls)
+            cls._instance.loaded = True
+        return cls._instance
+
+    def load(self):
+        return self
+
+    def _tokens(self, prompt, max_new_tokens):
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        count = min(max_new_tokens, STUB_LLM_TOKENS)
+        return [_STUB_WORDS[(seed >> i) % len(_STUB_WORDS)] for i in range(count)]
+
+    def generate_response(self, prompt, max_new_tokens=150, input_ids=None):
+        tokens = self._tokens(prompt, max_new_tokens)
+        seconds = (STUB_LLM_LATENCY_MS + STUB_LLM_MS_PER_TOKEN * len(tokens)) / 1000
+        with span("generate_response"):
+            time.sleep(seconds)
+        observe_generation(len(tokens), seconds)
+        return " ".join(tokens)
+
+    def stream_response(self, prompt, max_new_tokens=150, input_ids=None):
+        time.sleep(STUB_LLM_LATENCY_MS / 1000)
+        for i, token in enumerate(self._tokens(prompt, max_new_tokens)):
+            time.sleep(STUB_LLM_MS_PER_TOKEN / 1000)
+            yield token if i == 0 else f" {token}"
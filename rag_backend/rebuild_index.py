@@ -0,0 +1,55 @@
+"""
+Ajuste dos parâmetros HNSW das coleções sem parar o backend
+
+Sem opções de parâmetros, mostra a coleção atual de cada índice e seus
+parâmetros. Com --m/--construction-ef, reconstrói o índice a partir dos
+embeddings já gravados em uma nova coleção e troca as leituras para ela
+(os servidores em execução seguem o alias em poucos segundos). Só com
+--search-ef, altera a coleção atual na hora, sem reconstruir. Um índice
+dividido em shards é reconstruído um shard por vez.
+
+Uso:
+    cd rag_backend
+    python rebuild_index.py
+    python rebuild_index.py --index full_document_index --m 32 --construction-ef 200 --search-ef 100
+    python rebuild_index.py --index summary_index --search-ef 50
+"""
+import argparse
+import json
+
+INDEX_NAMES = ("summary_index", "full_document_index")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói o índice HNSW de uma coleção com novos parâmetros")
+    parser.add_argument("--index", choices=INDEX_NAMES + ("all",), default="all")
+    parser.add_argument("--m", type=int, default=None, help="Vizinhos por nó (hnsw:M)")
+    parser.add_argument("--construction-ef", type=int, default=None, help="Candidatos na construção (hnsw:construction_ef)")
+    parser.add_argument("--search-ef", type=int, default=None, help="Candidatos na busca (hnsw:search_ef)")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstrói mesmo sem --m/--construction-ef")
+    parser.add_argument("--page-size", type=int, default=1000, help="Documentos copiados por página")
+    parser.add_argument("--grace-seconds", type=float, default=None, help="Espera para os outros processos verem a troca")
+    parser.add_argument("--keep-old", action="store_true", help="Mantém a coleção antiga após a troca")
+    args = parser.parse_args()
+
+    from models.chroma_vector_store import ChromaVectorStore
+
+    store = ChromaVectorStore()
+    index_names = INDEX_NAMES if args.index == "all" else (args.index,)
+
+    for index_name in index_names:
+        if args.rebuild or args.m is not None or args.construction_ef is not None:
+            store.rebuild_collection(
+                index_name,
+                {"M": args.m, "construction_ef": args.construction_ef, "search_ef": args.search_ef},
+                page_size=args.page_size,
+                grace_seconds=args.grace_seconds,
+                keep_old=args.keep_old
+            )
+        elif args.search_ef is not None:
+            store.set_search_ef(index_name, args.search_ef)
+        print(f"{index_name}: {json.dumps(store.hnsw_config(index_name))}")
+
+
+if __name__ == "__main__":
+    main()
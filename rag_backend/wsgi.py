@@ -0,0 +1,9 @@
+"""
+Entry point WSGI para produção
+
+    cd rag_backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import app
+
+application = app